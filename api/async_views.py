@@ -0,0 +1,152 @@
+"""Native async variants of the login and OTP password-reset endpoints.
+
+These run on the ASGI event loop (``ideastar.asgi``) using the async ORM
+and cache APIs, with password hashing pushed onto a bounded executor.
+Request and response bodies match their DRF counterparts in ``views``.
+"""
+import json
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.core.exceptions import ValidationError
+from django.core.mail import send_mail
+from django.core.validators import validate_email
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from users.models import User
+from . import otp
+from .authentication import issue_tokens
+from .hashing import HashingBusy, amake_password
+from .throttling import aotp_wait
+
+
+def _parse(request, *fields, min_length=None):
+    """Return ``(data, errors)`` for a JSON body holding ``fields``."""
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None, {"detail": "JSON parse error."}
+    if not isinstance(data, dict):
+        return None, {"non_field_errors": ["Invalid data."]}
+
+    errors = {}
+    for field in fields:
+        value = data.get(field)
+        if value in (None, ""):
+            errors[field] = ["This field is required."]
+            continue
+        data[field] = value = str(value)
+        if field == "email":
+            try:
+                validate_email(value)
+            except ValidationError:
+                errors[field] = ["Enter a valid email address."]
+        elif min_length and field in min_length and len(value) < min_length[field]:
+            errors[field] = [f"Ensure this field has at least {min_length[field]} characters."]
+    return data, errors
+
+
+def _bad_request(errors):
+    return JsonResponse(errors, status=400)
+
+
+def _throttled(wait):
+    return JsonResponse(
+        {"detail": f"Request was throttled. Expected available in {ceil(wait)} seconds."},
+        status=429,
+        headers={"Retry-After": str(ceil(wait))},
+    )
+
+
+def _busy():
+    return JsonResponse({"detail": str(HashingBusy.default_detail)}, status=429, headers={"Retry-After": "1"})
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    data, errors = _parse(request, "email", "password")
+    if errors:
+        return _bad_request(errors)
+
+    try:
+        user = await aauthenticate(request, email=data["email"], password=data["password"])
+    except HashingBusy:
+        return _busy()
+    if user is None:
+        return _bad_request({"non_field_errors": ["Invalid credentials."]})
+
+    refresh, access = issue_tokens(user)
+    return JsonResponse({
+        "access": str(access),
+        "refresh": str(refresh),
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "password": user.first_name,
+        }
+    })
+
+
+@csrf_exempt
+@require_POST
+async def forgot_password(request):
+    data, errors = _parse(request, "email")
+    if errors:
+        return _bad_request(errors)
+    if wait := await aotp_wait(request, data["email"]):
+        return _throttled(wait)
+
+    if not await User.objects.filter(email=data["email"]).aexists():
+        return _bad_request({"email": ["User with this email does not exist."]})
+    code = await otp.aissue(data["email"])
+    await sync_to_async(send_mail)(
+        "Your OTP Code",
+        f"Use this OTP to reset your password: {code}",
+        settings.DEFAULT_FROM_EMAIL,
+        [data["email"]],
+        fail_silently=False,
+    )
+    return JsonResponse({"message": "OTP sent to your email"})
+
+
+@csrf_exempt
+@require_POST
+async def verify_code(request):
+    data, errors = _parse(request, "email", "otp")
+    if errors:
+        return _bad_request(errors)
+    if wait := await aotp_wait(request, data["email"]):
+        return _throttled(wait)
+
+    if not await otp.averify(data["email"], data["otp"]):
+        return _bad_request({"non_field_errors": ["Invalid or expired OTP"]})
+    return JsonResponse({"message": "OTP verified successfully"})
+
+
+@csrf_exempt
+@require_POST
+async def reset_password(request):
+    data, errors = _parse(request, "email", "password", min_length={"password": 8})
+    if errors:
+        return _bad_request(errors)
+    if wait := await aotp_wait(request, data["email"]):
+        return _throttled(wait)
+
+    if not await otp.ais_verified(data["email"]):
+        return _bad_request({"detail": "OTP not verified or expired."})
+    user = await User.objects.filter(email=data["email"]).only("password").afirst()
+    if user is None:
+        return _bad_request({"detail": "Invalid email."})
+    try:
+        user.password = await amake_password(data["password"])
+    except HashingBusy:
+        return _busy()
+    if not await otp.aconsume_verification(data["email"]):
+        return _bad_request({"detail": "OTP not verified or expired."})
+    await user.asave(update_fields=["password"])
+    return JsonResponse({"message": "Password has been reset successfully"})
@@ -0,0 +1,100 @@
+"""Stateless JWT authentication.
+
+Tokens issued by ``issue_tokens`` carry ``email`` and ``is_active`` claims
+next to ``user_id``, so ``StatelessJWTAuthentication`` resolves
+``request.user`` from the token, without loading the User row. Views
+should key queries on ``request.user.pk``.
+
+With ``AUTH_USER_CACHE_TIMEOUT`` set, each request also reads a few of
+the user's columns (``CACHED_USER_FIELDS``, never the password hash) from
+a short-lived cache entry, exposed as ``request.user.profile``. Saving or
+deleting the user forgets the entry, so a deactivated or deleted account
+is refused from its next request on. With 0 the claims alone are
+trusted: a deactivated account keeps working until its access token
+expires, but it cannot refresh.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import User
+
+CACHED_USER_FIELDS = ("id", "email", "first_name", "last_name", "profile_image", "is_active", "is_staff")
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """Return ``CACHED_USER_FIELDS`` of user ``user_id`` as a dict.
+
+    Raises ``User.DoesNotExist`` if the user has been deleted.
+    """
+    timeout = settings.AUTH_USER_CACHE_TIMEOUT
+    if not timeout:
+        return User.objects.values(*CACHED_USER_FIELDS).get(pk=user_id)
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.values(*CACHED_USER_FIELDS).get(pk=user_id)
+        cache.set(key, user, timeout)
+    return user
+
+
+def issue_tokens(user):
+    """Return ``(refresh, access)`` tokens carrying the claims ``ClaimsUser`` reads."""
+    refresh = RefreshToken.for_user(user)
+    refresh["email"] = user.email
+    refresh["is_active"] = user.is_active
+    return refresh, refresh.access_token
+
+
+class ClaimsUser(TokenUser):
+    @cached_property
+    def id(self):
+        # The claim is serialized as a string; match the model's pk type so
+        # comparisons and cache keys agree with real User instances.
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @cached_property
+    def is_active(self):
+        if settings.AUTH_USER_CACHE_TIMEOUT:
+            return self.profile["is_active"]
+        return self.token.get("is_active", True)
+
+    @cached_property
+    def profile(self):
+        return get_cached_user(self.pk)
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.pk == other.pk
+        return super().__eq__(other)
+
+    __hash__ = TokenUser.__hash__
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        try:
+            is_active = user.is_active
+        except User.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
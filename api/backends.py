@@ -0,0 +1,44 @@
+from django.contrib.auth.backends import ModelBackend
+
+from users.models import User
+from . import hashing
+
+
+class HashingPoolBackend(ModelBackend):
+    """``ModelBackend`` that checks passwords on the bounded hashing pool.
+
+    ``authenticate()`` keeps its contract: other backends are tried, a
+    failure sends ``user_login_failed``, and inactive users are refused by
+    ``user_can_authenticate``. A full pool raises ``HashingBusy`` out of
+    ``authenticate()``, which DRF answers with 429. Hashes written by an
+    older hasher configuration are upgraded on a successful check.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords.
+            hashing.make_password(password)
+            return None
+        if hashing.verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await User._default_manager.aget_by_natural_key(username)
+        except User.DoesNotExist:
+            await hashing.amake_password(password)
+            return None
+        if await hashing.averify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
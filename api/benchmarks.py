@@ -0,0 +1,650 @@
+"""Seeded, query-budgeted latency benchmarks for the API endpoints.
+
+``seed`` fills the database with synthetic users, projects and a
+power-law follow graph using ``bulk_create``. ``run`` replays each
+``Scenario`` through the test client and records the number of SQL
+queries and latency percentiles for each endpoint. ``compare`` diffs a
+run against a saved baseline. ``serializer_throughput`` compares the
+rows/sec of the DRF serializers with the ``fastpath`` plans, and
+``payload_costs`` compares the full and compact project serializers and
+times JSON rendering and compression of a project page.
+``pagination_scaling`` grows the project table and times the first and a
+deep cursor page at each size, and ``search_scaling`` times full-text
+search against a plain scan on a large table. ``handler_comparison`` drives concurrent
+logins through the WSGI and ASGI handlers, and ``login_throughput``
+measures logins/sec per core with the hashing pool full and overloaded.
+``sqlite_contention`` runs follows and unfollows against concurrent
+reads with the tuned SQLite options and with SQLite's defaults.
+``recommendations_cost`` grows the follow graph and measures a full
+``compute_recommendations`` run. ``manage.py benchmark_api`` ties them
+together.
+"""
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import threading
+import tracemalloc
+from base64 import b64encode
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from time import perf_counter
+from urllib.parse import quote, urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import OperationalError, connection, connections
+from django.db.models import Q
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.authentication import get_cached_user, issue_tokens
+from api.fastpath import compile_serializer
+from api.renderers import FastJSONRenderer
+from api.serializers import (
+    ProjectListSerializer,
+    ProjectSerializer,
+    UserSerializer,
+    UserSummarySerializer,
+)
+from ideastar.middleware import brotli
+from projects.facets import rebuild_facets
+from projects.models import Project
+from projects.search import rebuild_search_index
+from users.counters import recount_follow_counts
+from users.models import User, Follow
+from users.recommendations import compute_recommendations
+
+PASSWORD = "benchmark-password"
+WORDS = (
+    "solar agri drone mobile health clinic school fintech payments farm water "
+    "market fashion textile coding robotics vaccine loans savings crop irrigation"
+).split()
+
+
+def seed(users=1000, projects=2000, follows=10000, seed=0):
+    """Create synthetic data. Follow targets are Zipf-distributed, so a few
+    accounts collect most followers, as on the real service."""
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [User(email=f"bench{i}@example.com", password=password) for i in range(users)],
+        batch_size=1000,
+    )
+    user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+
+    _add_projects(rng, user_ids, projects)
+
+    weights = [1 / (rank + 1) for rank in range(len(user_ids))]
+    edges = set()
+    for _ in range(follows):
+        follower = rng.choice(user_ids)
+        followed = rng.choices(user_ids, weights)[0]
+        if follower != followed:
+            edges.add((follower, followed))
+    Follow.objects.bulk_create(
+        [Follow(follower_id=a, followed_id=b) for a, b in edges],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+    # bulk_create skips signals, so rebuild everything they maintain.
+    recount_follow_counts()
+    rebuild_facets()
+    rebuild_search_index()
+    compute_recommendations()
+    cache.clear()
+
+
+def _add_projects(rng, user_ids, count, words=60, batch_size=10000):
+    fields = [code for code, _ in Project.PROJECT_FIELD_CHOICES]
+    countries = ["KE", "NG", "GH", "UG", "TZ", "RW", "ZA", "ET"]
+    for start in range(0, count, batch_size):
+        Project.objects.bulk_create(
+            [
+                Project(
+                    user_id=rng.choice(user_ids),
+                    project_name=" ".join(rng.sample(WORDS, 3)).title(),
+                    project_description=" ".join(rng.choices(WORDS, k=words)),
+                    cover_image="cover_images/benchmark.jpg",
+                    project_location=rng.choice(countries),
+                    project_field=rng.choice(fields),
+                )
+                for _ in range(min(batch_size, count - start))
+            ],
+            batch_size=1000,
+        )
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    max_queries: int
+    data: dict = None
+    authenticated: bool = False
+    setup: object = None  # called before each timed request
+    # Served from the response cache, primed once; ``revalidate`` also
+    # sends the primed response's ETag as If-None-Match.
+    cached: bool = False
+    revalidate: bool = False
+
+
+def scenarios():
+    star = User.objects.order_by("-followers_count").values_list("id", flat=True).first()
+    fan = User.objects.order_by("-following_count").values_list("id", flat=True).first()
+    project = Project.objects.order_by("id").values_list("id", flat=True).first()
+    popular = list(User.objects.order_by("-followers_count").values_list("id", flat=True)[:100])
+    # Follow changes lock the follower's timeline. Without Redis that lock
+    # is six queries against the database-backed state cache.
+    lock = 6 if isinstance(caches["state"], DatabaseCache) else 0
+    return [
+        Scenario("project-list", "get", "/api/projects/", 1),
+        Scenario("project-list-filtered", "get", "/api/projects/?project_field=TECH&project_location=KE", 1),
+        Scenario("project-detail", "get", f"/api/projects/{project}/", 1),
+        Scenario("project-list-cached", "get", "/api/projects/", 0, cached=True),
+        Scenario("project-detail-cached", "get", f"/api/projects/{project}/", 0, cached=True),
+        Scenario("project-detail-304", "get", f"/api/projects/{project}/", 0, cached=True, revalidate=True),
+        Scenario("project-search", "get", "/api/projects/search/?q=solar farm", 2),
+        Scenario("project-facets", "get", "/api/projects/facets/", 1),
+        Scenario("user-detail", "get", f"/api/users/{star}/", 1),
+        Scenario("user-followers", "get", f"/api/users/{star}/followers/", 2),
+        Scenario("user-following", "get", f"/api/users/{fan}/following/", 2),
+        Scenario("recommendations", "get", "/api/users/recommendations/", 1, authenticated=True),
+        Scenario("login", "post", "/api/login/", 1, {"email": "bench0@example.com", "password": PASSWORD}),
+        Scenario(
+            "follow", "post", f"/api/users/{star}/follow/", 6 + lock, authenticated=True,
+            setup=lambda actor: Follow.objects.filter(follower=actor, followed_id=star).delete(),
+        ),
+        Scenario(
+            "bulk-follow", "post", "/api/users/bulk-follow/", 5 + lock, {"user_ids": popular}, authenticated=True,
+            setup=lambda actor: Follow.objects.filter(follower=actor).delete(),
+        ),
+        Scenario(
+            "unfollow", "post", f"/api/users/{star}/unfollow/", 7 + lock, authenticated=True,
+            setup=lambda actor: Follow.objects.get_or_create(follower=actor, followed_id=star),
+        ),
+    ]
+
+
+def _percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+def _time_requests(client, path, iterations):
+    """Return ``(timings_ms, max_queries, statuses)`` for ``iterations`` GETs."""
+    timings, queries, statuses = [], 0, set()
+    for _ in range(iterations):
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = perf_counter()
+            response = client.get(path, HTTP_ACCEPT="application/json")
+            timings.append((perf_counter() - start) * 1000)
+        queries = max(queries, len(captured))
+        statuses.add(response.status_code)
+    return timings, queries, statuses
+
+
+def run(iterations=50):
+    """Time every scenario against the current database.
+
+    The response cache is cleared before each request so the numbers
+    reflect the database and serialization path, except in ``cached``
+    scenarios, which measure the cache hit and 304 paths.
+    """
+    client = APIClient()
+    actor = User.objects.exclude(
+        pk=User.objects.order_by("-followers_count").values("pk")[:1]
+    ).order_by("id").last()
+    # Authenticated scenarios send a real bearer token so the cost of the
+    # authentication class is part of the measurement.
+    _, access = issue_tokens(actor)
+    results = {}
+    for scenario in scenarios():
+        if scenario.authenticated:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        else:
+            client.credentials()
+        headers = {"HTTP_ACCEPT": "application/json"}
+        if scenario.cached:
+            cache.clear()
+            primed = getattr(client, scenario.method)(scenario.path, scenario.data, format="json", **headers)
+            if scenario.revalidate:
+                headers["HTTP_IF_NONE_MATCH"] = primed.headers["ETag"]
+        timings, queries, statuses = [], 0, set()
+        for _ in range(iterations):
+            if scenario.setup:
+                scenario.setup(actor)
+            if not scenario.cached:
+                cache.clear()
+                # Keep the auth entry warm, as it is between a client's requests.
+                get_cached_user(actor.pk)
+            with CaptureQueriesContext(connection) as captured:
+                start = perf_counter()
+                response = getattr(client, scenario.method)(
+                    scenario.path, scenario.data, format="json", **headers
+                )
+                timings.append((perf_counter() - start) * 1000)
+            queries = max(queries, len(captured))
+            statuses.add(response.status_code)
+        results[scenario.name] = {
+            "queries": queries,
+            "max_queries": scenario.max_queries,
+            "statuses": sorted(statuses),
+            "p50_ms": round(_percentile(timings, 50), 3),
+            "p95_ms": round(_percentile(timings, 95), 3),
+            "p99_ms": round(_percentile(timings, 99), 3),
+        }
+    return results
+
+
+def _cursor(position):
+    # The token ProjectCursorPagination puts in its ``next`` links.
+    return quote(b64encode(urlencode({"p": position}).encode()).decode())
+
+
+def pagination_scaling(sizes=(1_000, 10_000, 100_000, 1_000_000), iterations=50, seed=0):
+    """Grow the project table through ``sizes`` and time the project list.
+
+    At each size the first page and a page starting halfway down the
+    table are requested through the API. With keyset pagination both
+    are an index range scan, so their latency should stay flat as the
+    table grows. Rows are added, never removed, so ``sizes`` must
+    increase.
+    """
+    rng = random.Random(seed)
+    user_ids = list(User.objects.values_list("id", flat=True))
+    client = APIClient()
+    results = {}
+    for size in sizes:
+        missing = size - Project.objects.count()
+        if missing > 0:
+            _add_projects(rng, user_ids, missing, words=12)
+        ids = Project.objects.order_by("id").values_list("id", flat=True)
+        middle = ids[Project.objects.count() // 2]
+        result = {"rows": Project.objects.count()}
+        for page, path in (("first", "/api/projects/"), ("deep", f"/api/projects/?cursor={_cursor(middle)}")):
+            timings, queries, statuses = _time_requests(client, path, iterations)
+            result[page] = {
+                "queries": queries,
+                "statuses": sorted(statuses),
+                "p50_ms": round(_percentile(timings, 50), 3),
+                "p95_ms": round(_percentile(timings, 95), 3),
+            }
+        results[size] = result
+    return results
+
+
+SEARCH_QUERIES = {
+    "word": "solar",
+    "prefix": "agri",
+    "two words": "solar farm",
+    "filtered": "water&project_location=KE",
+    "three words": "vaccine loans crop",
+    "no match": "zanzibar",
+}
+
+
+def search_scaling(rows=100_000, iterations=20, seed=0):
+    """Time ``/api/projects/search/`` once the table holds ``rows`` projects.
+
+    Each query is also run as the case-insensitive ``LIKE`` scan that
+    backends without an index fall back to, for comparison. The scan is
+    unranked and stops after the newest 20 matches, so it only has to
+    read the whole table when few rows match; the synthetic vocabulary
+    is small, so "no match" is the query that shows that case.
+    """
+    rng = random.Random(seed)
+    missing = rows - Project.objects.count()
+    if missing > 0:
+        _add_projects(rng, list(User.objects.values_list("id", flat=True)), missing, words=12)
+    rebuild_search_index()
+    client = APIClient()
+    results = {"rows": Project.objects.count(), "queries": {}}
+    for name, query in SEARCH_QUERIES.items():
+        text, _, extra = query.partition("&")
+        timings, queries, statuses = _time_requests(client, f"/api/projects/search/?q={text}&{extra}", iterations)
+        condition = Q()
+        for term in text.split():
+            condition &= Q(project_name__icontains=term) | Q(project_description__icontains=term)
+        filters = dict(pair.split("=") for pair in extra.split("&") if pair)
+        scan = Project.objects.filter(condition, **filters).order_by("-id")[:20]
+        scan_ms = [_timed(lambda: list(scan.all())) * 1000 for _ in range(max(1, iterations // 4))]
+        results["queries"][name] = {
+            "queries": queries,
+            "statuses": sorted(statuses),
+            "p50_ms": round(_percentile(timings, 50), 3),
+            "p95_ms": round(_percentile(timings, 95), 3),
+            "scan_p50_ms": round(_percentile(scan_ms, 50), 3),
+        }
+    return results
+
+
+def _load_summary(samples, elapsed):
+    timings = [ms for ms, _ in samples]
+    statuses = Counter(status for _, status in samples)
+    return {
+        "requests": len(samples),
+        "seconds": round(elapsed, 3),
+        "per_s": round(len(samples) / elapsed, 1),
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def _wsgi_load(path, body, clients, per_client, server_threads):
+    # ``clients`` keep one request each in flight; a semaphore stands in
+    # for the server's thread pool, so time spent waiting for a free
+    # thread counts towards latency as it would behind gunicorn.
+    server = threading.BoundedSemaphore(server_threads)
+
+    def client_loop(_):
+        client, samples = Client(), []
+        try:
+            for _ in range(per_client):
+                start = perf_counter()
+                with server:
+                    response = client.post(path, body, content_type="application/json")
+                samples.append(((perf_counter() - start) * 1000, response.status_code))
+        finally:
+            connections.close_all()
+        return samples
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        samples = [sample for batch in pool.map(client_loop, range(clients)) for sample in batch]
+    return _load_summary(samples, perf_counter() - start)
+
+
+def _asgi_load(path, body, clients, per_client):
+    async def client_loop():
+        client, samples = AsyncClient(), []
+        for _ in range(per_client):
+            start = perf_counter()
+            response = await client.post(path, body, content_type="application/json")
+            samples.append(((perf_counter() - start) * 1000, response.status_code))
+        return samples
+
+    async def main():
+        batches = await asyncio.gather(*(client_loop() for _ in range(clients)))
+        # The async ORM ran on asgiref's sync thread; release its connections.
+        await sync_to_async(connections.close_all)()
+        return [sample for batch in batches for sample in batch]
+
+    start = perf_counter()
+    samples = asyncio.run(main())
+    return _load_summary(samples, perf_counter() - start)
+
+
+def handler_comparison(clients=None, requests=200, server_threads=4):
+    """Replay concurrent logins through both request handlers.
+
+    ``wsgi`` posts to the sync ``/api/login/`` through the WSGI handler
+    with ``server_threads`` requests served at a time, like a threaded
+    WSGI worker; ``asgi`` posts to ``/api/async/login/`` through the ASGI
+    handler from one event loop, like a uvicorn worker. Both run in this
+    process with no server or socket in between, so the numbers compare
+    the handlers and views rather than the servers. ``clients`` defaults
+    to as many logins as the hashing pool admits at once; beyond that
+    both paths answer 429.
+    """
+    clients = clients or settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE
+    per_client = max(1, requests // clients)
+    body = {"email": "bench0@example.com", "password": PASSWORD}
+    return {
+        "wsgi": _wsgi_load("/api/login/", body, clients, per_client, server_threads),
+        "asgi": _asgi_load("/api/async/login/", body, clients, per_client),
+    }
+
+
+def login_throughput(requests=100):
+    """Logins/sec through the sync view with every hashing slot in use.
+
+    ``admitted`` runs exactly as many concurrent clients as the pool
+    admits (workers plus queue); ``overloaded`` doubles them, so the
+    surplus should be refused with 429 rather than slow everyone down.
+    ``per_core`` divides the successful logins/sec by the cores the pool
+    can use.
+    """
+    slots = settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE
+    cores = min(settings.PASSWORD_HASHING_WORKERS, os.cpu_count() or 1)
+    body = {"email": "bench0@example.com", "password": PASSWORD}
+    results = {}
+    for name, clients in (("admitted", slots), ("overloaded", slots * 2)):
+        result = _wsgi_load("/api/login/", body, clients, max(1, requests // clients), clients)
+        ok = result["statuses"].get(200, 0)
+        result["per_core"] = round(ok / result["seconds"] / cores, 1)
+        results[name] = result
+    return results
+
+
+# What a connection gets without the OPTIONS in settings: rollback
+# journal, deferred transactions and Python's 5 second busy timeout.
+# journal_mode is stored in the database file, so it has to be reset.
+SQLITE_DEFAULTS = {"init_command": "PRAGMA journal_mode=DELETE;"}
+
+
+def _contend(star, tokens, readers, seconds):
+    deadline = perf_counter() + seconds
+
+    def loop(client, requests):
+        samples = []
+        try:
+            while perf_counter() < deadline:
+                for method, path in requests:
+                    start = perf_counter()
+                    try:
+                        status = getattr(client, method)(path).status_code
+                    except OperationalError:
+                        # "database is locked"; a 500 in production.
+                        status = 500
+                    samples.append(((perf_counter() - start) * 1000, status))
+        finally:
+            connections.close_all()
+        return samples
+
+    writes = [("post", f"/api/users/{star}/follow/"), ("post", f"/api/users/{star}/unfollow/")]
+    reads = [("get", f"/api/users/{star}/followers/"), ("get", f"/api/users/{star}/")]
+    with ThreadPoolExecutor(max_workers=len(tokens) + readers) as pool:
+        writers = [
+            pool.submit(loop, Client(HTTP_AUTHORIZATION=f"Bearer {token}"), writes) for token in tokens
+        ]
+        readers = [pool.submit(loop, Client(), reads) for _ in range(readers)]
+        return {
+            "writes": _load_summary([s for future in writers for s in future.result()], seconds),
+            "reads": _load_summary([s for future in readers for s in future.result()], seconds),
+        }
+
+
+def sqlite_contention(writers=4, readers=4, seconds=5):
+    """Follow/unfollow a popular account from ``writers`` threads while
+    ``readers`` threads read its followers and profile, for ``seconds``,
+    first with SQLite's defaults and then with the tuned OPTIONS from
+    settings.
+
+    Only meaningful on a database file: an in-memory database has no
+    journal to tune. Returns ``{}`` on other backends.
+    """
+    if connection.vendor != "sqlite" or connection.is_in_memory_db():
+        return {}
+    database = connection.settings_dict
+    tuned = database["OPTIONS"]
+    star = User.objects.order_by("-followers_count").values_list("id", flat=True).first()
+    actors = list(User.objects.exclude(pk=star).order_by("-id")[:writers])
+    tokens = [str(issue_tokens(actor)[1]) for actor in actors]
+    results = {}
+    try:
+        for name, options in (("default", SQLITE_DEFAULTS), ("tuned", tuned)):
+            Follow.objects.filter(follower__in=actors, followed_id=star).delete()
+            connections.close_all()
+            database["OPTIONS"] = options
+            results[name] = _contend(star, tokens, readers, seconds)
+    finally:
+        connections.close_all()
+        database["OPTIONS"] = tuned
+    return results
+
+
+def _grow_graph(rng, users, follows):
+    missing = users - User.objects.count()
+    if missing > 0:
+        password = User.objects.values_list("password", flat=True).first()
+        start = User.objects.count()
+        User.objects.bulk_create(
+            [User(email=f"graph{start + i}@example.com", password=password) for i in range(missing)],
+            batch_size=5000,
+        )
+    user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(user_ids))))
+    while Follow.objects.count() < follows:
+        count = follows - Follow.objects.count()
+        followers = rng.choices(user_ids, k=count)
+        followed = rng.choices(user_ids, cum_weights=cum_weights, k=count)
+        Follow.objects.bulk_create(
+            [Follow(follower_id=a, followed_id=b) for a, b in zip(followers, followed) if a != b],
+            batch_size=10000,
+            ignore_conflicts=True,
+        )
+    recount_follow_counts()
+
+
+def recommendations_cost(users=100_000, follows=1_000_000, top_k=None, seed=0):
+    """Grow the graph to ``users`` accounts and ``follows`` Zipf-distributed
+    edges, then run ``compute_recommendations`` end to end: loading the
+    graph, scoring every user and writing the results.
+
+    The run is timed once as is and once under ``tracemalloc`` for the
+    peak of Python allocations, since tracing slows it down.
+    """
+    top_k = top_k or settings.FOLLOW_RECOMMENDATIONS_TOP_K
+    _grow_graph(random.Random(seed), users, follows)
+    seconds = _timed(lambda: compute_recommendations(top_k=top_k))
+    tracemalloc.start()
+    try:
+        written = compute_recommendations(top_k=top_k)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "users": User.objects.count(),
+        "edges": Follow.objects.count(),
+        "written": written,
+        "seconds": round(seconds, 2),
+        "peak_mib": round(peak / 1024 ** 2, 1),
+    }
+
+
+def compare(results, baseline, tolerance=0.25, min_delta_ms=1.0):
+    """Return human-readable regressions of ``results`` against ``baseline``.
+
+    A latency change counts only if it is beyond both the relative
+    ``tolerance`` and ``min_delta_ms``, so sub-millisecond jitter on fast
+    endpoints does not fail a run.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: {current['queries']} queries (baseline {previous['queries']})")
+        slower = current["p95_ms"] - previous["p95_ms"]
+        if slower > min_delta_ms and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms (baseline {previous['p95_ms']}ms)")
+    return regressions
+
+
+def _rows_per_second(render, rows, repeat):
+    best = min(_timed(render) for _ in range(repeat))
+    return round(rows / best)
+
+
+def _timed(fn):
+    start = perf_counter()
+    fn()
+    return perf_counter() - start
+
+
+def serializer_throughput(rows=1000, repeat=5):
+    """Rows/sec for one page of ``rows`` through each list serializer,
+    materialized once, and through its compiled fast-path plan."""
+    request = Request(APIRequestFactory().get("/"))
+    results = {}
+    for serializer_class in (ProjectSerializer, ProjectListSerializer, UserSerializer, UserSummarySerializer):
+        model = serializer_class.Meta.model
+        context = {"request": request}
+        plan = compile_serializer(serializer_class(context=context))
+        queryset = model.objects.order_by("-pk")[:rows]
+        instances = list(queryset)
+        values = list(queryset.values(*plan.columns))
+
+        def drf():
+            return serializer_class(instances, many=True, context=context).data
+
+        def fast():
+            return plan.render(values)
+
+        results[serializer_class.__name__] = {
+            "rows": len(instances),
+            "drf_rows_per_s": _rows_per_second(drf, len(instances), repeat),
+            "fast_rows_per_s": _rows_per_second(fast, len(instances), repeat),
+        }
+    return results
+
+
+def payload_costs(rows=1000, repeat=5):
+    """Serialize, render and compress a project list page of up to
+    ``rows`` rows; returns the page's row count and milliseconds and
+    bytes per variant.
+
+    ``full serializer`` and ``compact serializer`` time the DRF
+    ``ProjectSerializer`` and the ``ProjectListSerializer`` the list
+    pages use, from model instances to JSON bytes. The other variants
+    render the full page with each renderer and encoding.
+    """
+    request = Request(APIRequestFactory().get("/"))
+    instances = list(Project.objects.order_by("-pk")[:rows])
+
+    results = {}
+    for name, serializer_class in (("full serializer", ProjectSerializer), ("compact serializer", ProjectListSerializer)):
+        def serialize():
+            return FastJSONRenderer().render(
+                serializer_class(instances, many=True, context={"request": request}).data
+            )
+
+        results[name] = {
+            "ms": round(min(_timed(serialize) for _ in range(repeat)) * 1000, 2),
+            "bytes": len(serialize()),
+        }
+
+    serializer = ProjectSerializer(context={"request": request})
+    plan = compile_serializer(serializer)
+    data = plan.render(Project.objects.order_by("-pk").values(*plan.columns)[:rows])
+    for name, renderer in (("json", JSONRenderer()), ("fast-json", FastJSONRenderer())):
+        results[name] = {
+            "ms": round(min(_timed(lambda: renderer.render(data)) for _ in range(repeat)) * 1000, 2),
+            "bytes": len(renderer.render(data)),
+        }
+    body = FastJSONRenderer().render(data)
+    encoders = {"gzip": lambda: compress_string(body)}
+    if brotli is not None:
+        encoders["brotli"] = lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    for name, encode in encoders.items():
+        results[name] = {
+            "ms": round(min(_timed(encode) for _ in range(repeat)) * 1000, 2),
+            "bytes": len(encode()),
+        }
+    return {"rows": len(instances), "variants": results}
@@ -0,0 +1,46 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from projects.cache import get_version, reserve_entry, response_key
+
+
+class VersionedCacheMixin:
+    """Serve ``list``/``retrieve`` from the versioned project cache.
+
+    The ETag is derived from the cache version and the request, so a
+    matching ``If-None-Match`` is answered with 304 from a single cache
+    read, without touching the database.
+    """
+
+    def _cached(self, build):
+        request = self.request
+        version = get_version()
+        key = hashlib.sha1(
+            f"{request.build_absolute_uri()}|{request.accepted_media_type}".encode()
+        ).hexdigest()
+        etag = f'"{version}-{key[:20]}"'
+
+        # Weak comparison: compression turns the ETag into W/"...".
+        if_none_match = request.headers.get("If-None-Match", "")
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        data = cache.get(response_key(version, key))
+        if data is None:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            if reserve_entry(version):
+                cache.set(response_key(version, key), data, timeout=settings.PROJECT_CACHE_TIMEOUT)
+        return Response(data, headers={"ETag": etag})
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(lambda: super(VersionedCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(lambda: super(VersionedCacheMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,103 @@
+"""Read-only fast path for rendering large pages.
+
+A DRF serializer renders each row through ``field.get_attribute`` and a
+full model instance. For serializers whose fields all map straight onto
+model columns, ``compile_serializer`` turns the bound field list into a
+plan once per request. The plan is the column list for ``.values()``
+and one converter per field. ``render`` then builds each output dict
+directly from the value rows.
+
+The converters call the same ``field.to_representation`` as the
+serializer, so the output is identical. Foreign keys are passed in as
+``PKOnlyObject``. File names are wrapped in a minimal object exposing
+``name``/``url``, as a ``FieldFile`` would. Any field the plan cannot
+express (method fields, nested serializers, dotted sources, ...) makes
+``compile_serializer`` return None, and callers fall back to the
+serializer.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import relations, serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+
+class _StoredFile:
+    __slots__ = ("name", "storage")
+
+    def __init__(self, name, storage):
+        self.name = name
+        self.storage = storage
+
+    def __bool__(self):
+        return bool(self.name)
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+
+def _converter(field, model_field):
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return lambda value: field.to_representation(PKOnlyObject(pk=value))
+    if isinstance(model_field, models.FileField):
+        storage = model_field.storage
+        return lambda value: field.to_representation(_StoredFile(value, storage))
+    return field.to_representation
+
+
+class Plan:
+    def __init__(self, columns, converters):
+        self.columns = columns
+        self._converters = converters
+
+    def render(self, rows):
+        converters = self._converters
+        return [
+            {
+                name: None if row[column] is None else convert(row[column])
+                for name, column, convert in converters
+            }
+            for row in rows
+        ]
+
+
+def compile_serializer(serializer, prefix=""):
+    """Return a ``Plan`` for ``serializer``'s readable fields, or None.
+
+    ``prefix`` is prepended to every column, for rows read across a
+    relation (e.g. ``"follower__"`` over ``Follow``).
+    """
+    opts = serializer.Meta.model._meta
+    converters = []
+    for field in serializer._readable_fields:
+        if isinstance(field, (serializers.BaseSerializer, relations.ManyRelatedField)):
+            return None
+        if isinstance(field, relations.RelatedField) and not isinstance(
+            field, relations.PrimaryKeyRelatedField
+        ):
+            return None
+        try:
+            model_field = opts.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        converters.append((field.field_name, prefix + field.source, _converter(field, model_field)))
+    # The primary key is always read; cursor pagination orders on it.
+    columns = list(dict.fromkeys([prefix + opts.pk.name] + [column for _, column, _ in converters]))
+    return Plan(columns, converters)
+
+
+class FastPathListMixin:
+    """Renders ``list`` through a compiled plan when the serializer allows it."""
+
+    def list(self, request, *args, **kwargs):
+        plan = compile_serializer(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = self.filter_queryset(self.get_queryset()).values(*plan.columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.render(page))
+        return Response(plan.render(rows))
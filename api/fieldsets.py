@@ -0,0 +1,79 @@
+"""Sparse fieldsets for read endpoints.
+
+``?fields=id,email`` keeps only the named fields and ``?omit=email`` drops
+fields. Both take serializer field names. The selection is applied to the
+serializer and, through ``model_columns``, to the SQL, so columns that
+are not rendered are not loaded either.
+
+Views can also name a compact ``list_serializer_class`` for list-style
+actions. It is used unless the client asks for specific ``fields``, in
+which case the full serializer is narrowed instead.
+"""
+from rest_framework import permissions, serializers
+
+
+def _param(request, name):
+    value = request.query_params.get(name, "")
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def selected_fields(request, available):
+    """Return the names in ``available`` that ``request`` asks for, in order."""
+    fields, omit = _param(request, "fields"), _param(request, "omit")
+    unknown = [name for name in fields + omit if name not in available]
+    if unknown:
+        raise serializers.ValidationError(
+            {"fields": [f"Unknown field '{name}'." for name in unknown]}
+        )
+    keep = set(fields or available) - set(omit)
+    return [name for name in available if name in keep]
+
+
+def model_columns(serializer, prefix=""):
+    """Concrete model fields ``serializer`` reads, for ``QuerySet.only()``."""
+    opts = serializer.Meta.model._meta
+    concrete = {field.name for field in opts.concrete_fields}
+    columns = [prefix + opts.pk.name]
+    for field in serializer.fields.values():
+        if not field.write_only and field.source in concrete:
+            columns.append(prefix + field.source)
+    return columns
+
+
+class SparseFieldsetSerializerMixin:
+    """Drops the fields a GET request did not select.
+
+    Only applies to the top-level serializer: nested serializers are built
+    before they are bound to a parent, so they see no request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return
+        readable = [name for name, field in self.fields.items() if not field.write_only]
+        keep = set(selected_fields(request, readable))
+        for name in readable:
+            if name not in keep:
+                self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    list_serializer_class = None
+    list_actions = ("list",)
+
+    def get_serializer_class(self):
+        if (
+            self.list_serializer_class is not None
+            and self.action in self.list_actions
+            and "fields" not in self.request.query_params
+        ):
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def only_serialized(self, queryset):
+        """Defer every column the response will not render (reads only)."""
+        if self.request is None or self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        return queryset.only(*model_columns(self.get_serializer()))
@@ -0,0 +1,84 @@
+"""Password hashing on a bounded, admission-controlled worker pool.
+
+PBKDF2 runs inside hashlib with the GIL released, so a small thread pool
+gives real parallelism while capping how many cores hashing can occupy.
+When every worker is busy and the waiting line is full, new work is
+refused with a 429 instead of queueing behind a login burst.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import exceptions
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    thread_name_prefix="password-hashing",
+)
+_slots = threading.BoundedSemaphore(
+    settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE
+)
+
+
+class HashingBusy(exceptions.Throttled):
+    default_detail = "Too many password operations in progress, try again shortly."
+
+    def __init__(self):
+        super().__init__(wait=1)
+
+
+def _submit(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def _needs_rehash(encoded):
+    # Mirrors django.contrib.auth.hashers.check_password's upgrade rule.
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = hashers.get_hasher("default")
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def make_password(password):
+    return _submit(hashers.make_password, password).result()
+
+
+def set_password(user, password):
+    user.password = make_password(password)
+    user._password = password
+
+
+def verify_password(user, password):
+    """Check ``password`` for ``user``, upgrading the stored hash if the
+    hasher configuration has changed since it was written."""
+    if not _submit(hashers.check_password, password, user.password).result():
+        return False
+    if _needs_rehash(user.password):
+        set_password(user, password)
+        user.save(update_fields=["password"])
+    return True
+
+
+async def amake_password(password):
+    return await asyncio.wrap_future(_submit(hashers.make_password, password))
+
+
+async def averify_password(user, password):
+    if not await asyncio.wrap_future(_submit(hashers.check_password, password, user.password)):
+        return False
+    if _needs_rehash(user.password):
+        user.password = await amake_password(password)
+        await user.asave(update_fields=["password"])
+    return True
@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from api import benchmarks
+from ideastar.test_runner import ISOLATED_CACHES
+
+
+def benchmark_caches(directory):
+    """The configured caches, kept private to the run.
+
+    The file and database caches the app ships with are benchmarked as
+    configured, the file cache moved into ``directory`` and the database
+    cache living in the throwaway test database. Anything else (Redis) is
+    shared with live processes and would be flushed by the run, so it is
+    replaced with the in-process cache the test runner uses.
+    """
+    configured = {}
+    for alias, config in settings.CACHES.items():
+        backend = config["BACKEND"]
+        if backend.endswith(".FileBasedCache"):
+            configured[alias] = {**config, "LOCATION": os.path.join(directory, alias)}
+        elif backend.endswith(".DatabaseCache") or backend == "ideastar.cache.DatabaseStateCache":
+            configured[alias] = config
+        else:
+            configured[alias] = ISOLATED_CACHES.get(alias, ISOLATED_CACHES["default"])
+    return configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic data and benchmark every "
+        "API endpoint: query budgets and latency percentiles, optionally "
+        "compared against a saved baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--projects", type=int, default=2000)
+        parser.add_argument("--follows", type=int, default=10000)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--save-baseline", metavar="PATH", help="Write results to a JSON baseline file.")
+        parser.add_argument("--compare", metavar="PATH", help="Fail if results regress against this baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown (0.25 = 25%%).")
+        parser.add_argument(
+            "--scaling", metavar="SIZES",
+            help="Also time the project list as the table grows through these comma-separated "
+                 "row counts, e.g. 1000,10000,100000,1000000.",
+        )
+        parser.add_argument(
+            "--search-rows", type=int, metavar="ROWS",
+            help="Also time project search once the table holds ROWS projects, e.g. 100000.",
+        )
+        parser.add_argument(
+            "--handlers", action="store_true",
+            help="Also replay concurrent logins through the WSGI and ASGI handlers.",
+        )
+        parser.add_argument(
+            "--logins", action="store_true",
+            help="Also measure logins/sec per core with the password-hashing pool saturated.",
+        )
+        parser.add_argument(
+            "--contention", action="store_true",
+            help="Also run concurrent follows and unfollows against reads, with default and tuned "
+                 "SQLite options. Puts the test database in a file instead of memory.",
+        )
+        parser.add_argument(
+            "--recommendation-edges", type=int, metavar="EDGES",
+            help="Also time a full compute_recommendations run once the graph holds EDGES follows "
+                 "(one user per ten edges), e.g. 1000000.",
+        )
+        parser.add_argument(
+            "--clients", type=int,
+            help="Concurrent clients for the load scenarios (default: what the hashing pool admits).",
+        )
+
+    def handle(self, *args, **options):
+        cache_dir = tempfile.mkdtemp(prefix="benchmark-cache-")
+        isolated_caches = override_settings(CACHES=benchmark_caches(cache_dir))
+        isolated_caches.enable()
+        try:
+            self._benchmark(options)
+        finally:
+            isolated_caches.disable()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def _benchmark(self, options):
+        setup_test_environment()
+        database_dir = None
+        if options["contention"] and connection.vendor == "sqlite":
+            # WAL and the busy timeout only apply to a database file. Its
+            # -wal and -shm files go with the directory afterwards.
+            database_dir = tempfile.mkdtemp(prefix="benchmark-")
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(database_dir, "benchmark.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            benchmarks.seed(options["users"], options["projects"], options["follows"])
+            results = benchmarks.run(options["iterations"])
+            throughput = benchmarks.serializer_throughput()
+            payload = benchmarks.payload_costs()
+            scaling = None
+            if options["scaling"]:
+                sizes = [int(size) for size in options["scaling"].split(",")]
+                scaling = benchmarks.pagination_scaling(sizes, options["iterations"])
+            search = None
+            if options["search_rows"]:
+                search = benchmarks.search_scaling(options["search_rows"], options["iterations"])
+            handlers = None
+            if options["handlers"]:
+                handlers = benchmarks.handler_comparison(options["clients"])
+            logins = benchmarks.login_throughput() if options["logins"] else None
+            contention = benchmarks.sqlite_contention() if options["contention"] else None
+            recommendations = None
+            if options["recommendation_edges"]:
+                edges = options["recommendation_edges"]
+                recommendations = benchmarks.recommendations_cost(max(edges // 10, options["users"]), edges)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if database_dir:
+                shutil.rmtree(database_dir, ignore_errors=True)
+
+        failures = []
+        self.stdout.write(f"{'endpoint':<24}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  status")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<24}{result['queries']:>8}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}  {result['statuses']}"
+            )
+            if result["queries"] > result["max_queries"]:
+                failures.append(f"{name}: {result['queries']} queries exceeds budget of {result['max_queries']}")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'serializer':<24}{'rows':>8}{'drf rows/s':>14}{'fast rows/s':>14}")
+        for name, result in throughput.items():
+            self.stdout.write(
+                f"{name:<24}{result['rows']:>8}{result['drf_rows_per_s']:>14}{result['fast_rows_per_s']:>14}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'project page (' + str(payload['rows']) + ' rows)':<24}{'ms':>8}{'bytes':>14}")
+        for name, result in payload["variants"].items():
+            self.stdout.write(f"{name:<24}{result['ms']:>8.2f}{result['bytes']:>14}")
+
+        if scaling:
+            self.stdout.write("")
+            self.stdout.write(
+                f"{'project list at rows':<24}{'queries':>8}{'first p50':>11}{'first p95':>11}"
+                f"{'deep p50':>11}{'deep p95':>11}"
+            )
+            for result in scaling.values():
+                first, deep = result["first"], result["deep"]
+                self.stdout.write(
+                    f"{result['rows']:<24}{max(first['queries'], deep['queries']):>8}"
+                    f"{first['p50_ms']:>11.2f}{first['p95_ms']:>11.2f}{deep['p50_ms']:>11.2f}{deep['p95_ms']:>11.2f}"
+                )
+
+        if search:
+            self.stdout.write("")
+            self.stdout.write(
+                f"{'search at ' + str(search['rows']) + ' rows':<24}{'queries':>8}"
+                f"{'p50 ms':>10}{'p95 ms':>10}{'scan p50':>10}"
+            )
+            for name, result in search["queries"].items():
+                self.stdout.write(
+                    f"{name:<24}{result['queries']:>8}{result['p50_ms']:>10.2f}"
+                    f"{result['p95_ms']:>10.2f}{result['scan_p50_ms']:>10.2f}"
+                )
+
+        if handlers:
+            self._write_load("login via handler", handlers)
+        if logins:
+            self._write_load("login throughput", logins)
+            for name, result in logins.items():
+                self.stdout.write(f"{name:<24}{result['per_core']:>10.1f} successful logins/s per core")
+
+        if contention:
+            for name, result in contention.items():
+                self._write_load(f"contention ({name})", result)
+
+        if recommendations:
+            self.stdout.write("")
+            self.stdout.write(
+                f"compute_recommendations: {recommendations['users']} users, {recommendations['edges']} edges, "
+                f"{recommendations['written']} rows written in {recommendations['seconds']:.2f}s, "
+                f"peak {recommendations['peak_mib']:.1f} MiB traced"
+            )
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as fh:
+                json.dump(results, fh, indent=2, sort_keys=True)
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                failures += benchmarks.compare(results, json.load(fh), options["tolerance"])
+
+        if failures:
+            raise CommandError("Benchmark regressions:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All endpoints within budget."))
+
+    def _write_load(self, title, results):
+        self.stdout.write("")
+        self.stdout.write(f"{title:<24}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}  statuses")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<24}{result['requests']:>10}{result['per_s']:>10.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}  {result['statuses']}"
+            )
@@ -0,0 +1,97 @@
+"""Access-checked serving of uploaded media.
+
+``serve_media`` only serves paths inside ``MEDIA_PUBLIC_DIRS`` and
+``MEDIA_PRIVATE_DIRS``. A private file (a project document) is only
+served to the owner of a project that references it; anyone else gets a
+404, so the name does not reveal that the file exists. Documents are
+de-duplicated by content, so one file can belong to several projects.
+
+The view does not read the file itself unless ``MEDIA_SERVE_MODE`` says
+to:
+
+* ``"accel"``: reply with ``X-Accel-Redirect`` pointing into
+  ``MEDIA_ACCEL_REDIRECT_PREFIX``, for nginx to send from an internal
+  location::
+
+      location /protected-media/ {
+          internal;
+          alias /path/to/MEDIA_ROOT/;
+      }
+
+* ``"sendfile"``: reply with ``X-Sendfile`` and the absolute path, for
+  Apache mod_xsendfile or lighttpd;
+* ``"django"``: stream the file from the worker (development).
+
+Content-hashed names (see ``ideastar.storage``) get a one-year
+``immutable`` ``Cache-Control``; older names are cached for an hour.
+"""
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from ideastar.storage import is_content_hashed
+from projects.models import Project
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MUTABLE_MAX_AGE = 60 * 60
+
+
+def _media_name(path):
+    name = posixpath.normpath(path)
+    if name.startswith(("/", "../")) or name == ".." or "\\" in name:
+        raise Http404
+    top = name.split("/", 1)[0]
+    if top in settings.MEDIA_PUBLIC_DIRS:
+        return name, False
+    if top in settings.MEDIA_PRIVATE_DIRS:
+        return name, True
+    raise Http404
+
+
+def _request_user(request):
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        user = Request(request, authenticators=authenticators).user
+    except exceptions.APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+def _owns(user, name):
+    return Project.objects.filter(project_document=name, user_id=user.pk).exists()
+
+
+@require_safe
+def serve_media(request, path):
+    name, private = _media_name(path)
+    if private:
+        user = _request_user(request)
+        if user is None:
+            return HttpResponse(status=401, headers={"WWW-Authenticate": 'Bearer realm="api"'})
+        if not _owns(user, name):
+            raise Http404
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode in ("accel", "sendfile"):
+        if mode == "accel":
+            response = HttpResponse(headers={"X-Accel-Redirect": settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)})
+        else:
+            response = HttpResponse(headers={"X-Sendfile": default_storage.path(name)})
+        # Let the proxy pick the type from the file it sends.
+        del response["Content-Type"]
+    else:
+        try:
+            response = FileResponse(default_storage.open(name, "rb"))
+        except (FileNotFoundError, IsADirectoryError):
+            raise Http404
+
+    max_age, immutable = (IMMUTABLE_MAX_AGE, ", immutable") if is_content_hashed(name) else (MUTABLE_MAX_AGE, "")
+    response["Cache-Control"] = f"{'private' if private else 'public'}, max-age={max_age}{immutable}"
+    return response
@@ -0,0 +1,84 @@
+"""One-time codes for the password-reset flow.
+
+Each email has one current cache record, holding either
+``("sent", code)`` or ``("verified",)``. Records are versioned: each
+lives under its own key, ``otp:<email digest>:<token>``, and the email's
+key holds the token of the current one. Issuing a code writes a new
+record and repoints the email's key, leaving older records to expire.
+
+A record is spent by compare-and-delete: the caller reads the current
+record, checks it, then deletes that version's key, and only the caller
+whose ``cache.delete`` returns True may continue. The key names one
+version, so a delete can only remove the record that was checked, never
+a code issued in between. A verified code is replaced by a
+``("verified",)`` record under the same token, which a newer code
+supersedes. So a code is accepted once, and a verification is spent by
+at most one reset, even when requests race. Only ``get``/``set``/
+``add``/``delete`` are used, on the ``state`` cache (Redis, or a
+database table without REDIS_URL), where they are atomic across
+processes and records are never evicted early.
+"""
+import hashlib
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ideastar.cache import state_cache as cache
+
+SENT = "sent"
+VERIFIED = "verified"
+
+
+def _key(email):
+    digest = hashlib.sha1(email.strip().lower().encode()).hexdigest()
+    return f"otp:{digest}"
+
+
+def _current(key):
+    """The key of the email's current record version, or None."""
+    token = cache.get(key)
+    return None if token is None else f"{key}:{token}"
+
+
+def issue(email):
+    """Create a fresh code for ``email``, replacing any earlier one."""
+    code = str(1000 + secrets.randbelow(9000))
+    key, token = _key(email), secrets.token_hex(8)
+    cache.set(f"{key}:{token}", (SENT, code), timeout=settings.OTP_TIMEOUT)
+    # The pointer outlives the record so a verification can take its place.
+    cache.set(key, token, timeout=settings.OTP_TIMEOUT + settings.OTP_VERIFIED_TIMEOUT)
+    return code
+
+
+def _take(key, expected):
+    """Delete the current record if it equals ``expected``; return its key."""
+    record = _current(key)
+    if record is not None and cache.get(record) == expected and cache.delete(record):
+        return record
+    return None
+
+
+def verify(email, code):
+    """Accept ``code`` once; on success the email may reset its password."""
+    record = _take(_key(email), (SENT, str(code)))
+    if record is None:
+        return False
+    cache.add(record, (VERIFIED,), timeout=settings.OTP_VERIFIED_TIMEOUT)
+    return True
+
+
+def is_verified(email):
+    record = _current(_key(email))
+    return record is not None and cache.get(record) == (VERIFIED,)
+
+
+def consume_verification(email):
+    """Spend a successful verification; True for exactly one caller."""
+    return _take(_key(email), (VERIFIED,)) is not None
+
+
+aissue = sync_to_async(issue)
+averify = sync_to_async(verify)
+ais_verified = sync_to_async(is_verified)
+aconsume_verification = sync_to_async(consume_verification)
@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ProjectCursorPagination(CursorPagination):
+    # Keyset pagination on the primary key: each page is an indexed range
+    # scan, so the cost of a page does not grow with the table.
+    ordering = "-id"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class FollowCursorPagination(CursorPagination):
+    # Pages over Follow rows, newest first, using the
+    # (followed, created_at) / (follower, created_at) indexes.
+    ordering = "-created_at"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
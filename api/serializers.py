@@ -1,3 +1,4 @@
+from django.contrib.auth import authenticate
 from django.contrib.auth.forms import PasswordResetForm
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
@@ -5,15 +6,35 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from rest_framework.validators import UniqueValidator
-from users.models import User, Follow
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from users.models import User, Follow, FollowRecommendation
 from django_rest_passwordreset.models import ResetPasswordToken
-import random
-from django.core.cache import cache
-from django.contrib.auth import authenticate
-from projects.models import Project
+from django.core.files.storage import default_storage
+from django_countries import countries
+from projects.models import Project, ChunkedUpload
+from . import hashing, otp
+from .fieldsets import SparseFieldsetSerializerMixin
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Renders a ``*_renditions`` JSONField as ``{size: {format: url}}``."""
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        urls = {}
+        for size, formats in (value or {}).items():
+            if size == "source":
+                continue
+            urls[size] = {}
+            for fmt, name in formats.items():
+                url = default_storage.url(name)
+                urls[size][fmt] = request.build_absolute_uri(url) if request is not None else url
+        return urls
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
+    profile_image_renditions = RenditionsField()
 
     class Meta:
         model = User
@@ -22,6 +43,7 @@ class UserSerializer(serializers.ModelSerializer):
             "email",
             "password",         
             "profile_image",
+            "profile_image_renditions",
             "followers_count",
             "following_count",
             "created_at",
@@ -37,16 +59,33 @@ class UserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         password = validated_data.pop("password")
         user = User(**validated_data)
-        user.set_password(password)
+        hashing.set_password(user, password)
         user.save()
         return user
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class UserSummarySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    profile_image_renditions = RenditionsField()
+
     class Meta:
-        model = Follow
-        fields = ["id", "follower", "followed", "created_at"]
-        read_only_fields = ["created_at"]
+        model = User
+        fields = [
+            "id",
+            "email",
+            "profile_image",
+            "profile_image_renditions",
+            "followers_count",
+            "following_count",
+        ]
+
+
+class FollowRecommendationSerializer(serializers.ModelSerializer):
+    user = UserSummarySerializer(source="recommended", read_only=True)
+
+    class Meta:
+        model = FollowRecommendation
+        fields = ["user", "score", "reason"]
+        read_only_fields = fields
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -56,6 +95,14 @@ class FollowSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at"]
 
 
+class BulkFollowSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_FOLLOW_MAX_IDS,
+    )
+
+
 class SignupSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
         write_only=True,
@@ -90,7 +137,7 @@ class SignupSerializer(serializers.ModelSerializer):
         validated_data.pop("confirm_password", None)
         password = validated_data.pop("password")
         user = User(**validated_data)
-        user.set_password(password)
+        hashing.set_password(user, password)
         user.save()
         return user
 
@@ -99,12 +146,8 @@ class ForgotPasswordSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
     def validate_email(self, value):
-        try:
-            user = User.objects.get(email=value)
-        except User.DoesNotExist:
+        if not User.objects.filter(email=value).exists():
             raise serializers.ValidationError("User with this email does not exist.")
-        otp = random.randint(1000, 9999)
-        cache.set(f"otp_{user.id}", otp, timeout=600)
         return value
 
 
@@ -113,12 +156,7 @@ class VerifyCodeSerializer(serializers.Serializer):
     otp = serializers.CharField(max_length=4)
 
     def validate(self, data):
-        try:
-            user = User.objects.get(email=data["email"])
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Invalid email")
-        cached_otp = cache.get(f"otp_{user.id}")
-        if not cached_otp or str(cached_otp) != str(data["otp"]):
+        if not otp.verify(data["email"], data["otp"]):
             raise serializers.ValidationError("Invalid or expired OTP")
         return data
 
@@ -128,10 +166,18 @@ class ResetPasswordSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True, min_length=8)
 
     def save(self, **kwargs):
-        user = User.objects.get(email=self.validated_data["email"])
-        user.set_password(self.validated_data["password"])
-        user.save()
-        cache.delete(f"otp_{user.id}")
+        """Reset the password if ``email`` holds a verified OTP; returns
+        None otherwise."""
+        email = self.validated_data["email"]
+        if not otp.is_verified(email):
+            return None
+        user = User.objects.only("password").get(email=email)
+        hashing.set_password(user, self.validated_data["password"])
+        # Spend the verification only once the new hash is ready, so a busy
+        # hashing pool (429) leaves it usable for a retry.
+        if not otp.consume_verification(email):
+            return None
+        user.save(update_fields=["password"])
         return user
 
 
@@ -140,16 +186,90 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
     def validate(self, data):
-        user = authenticate(email=data["email"], password=data["password"])
-        if not user:
+        # Inactive accounts are refused like wrong passwords (see
+        # api.backends.HashingPoolBackend).
+        user = authenticate(self.context.get("request"), email=data["email"], password=data["password"])
+        if user is None:
             raise serializers.ValidationError("Invalid credentials.")
-        if not user.is_active:
-            raise serializers.ValidationError("This account is inactive.")
         data["user"] = user
         return data
 
-class ProjectSerializer(serializers.ModelSerializer):
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Refuses a deleted account like an inactive one, instead of failing
+    with ``User.DoesNotExist``."""
+
+    def validate(self, attrs):
+        try:
+            return super().validate(attrs)
+        except User.DoesNotExist:
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+
+# The field ModelSerializer generates for a CountryField translates all ~250
+# country names every time a serializer is built; these labels stay lazy.
+COUNTRY_CHOICES = list(countries.countries.items())
+
+
+class ProjectSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    project_location = serializers.ChoiceField(choices=COUNTRY_CHOICES)
+    cover_image_renditions = RenditionsField()
+    project_products_renditions = RenditionsField()
+
     class Meta:
         model = Project
-        fields = '__all__'  
+        fields = [
+            "id",
+            "project_name",
+            "project_description",
+            "cover_image",
+            "cover_image_renditions",
+            "project_location",
+            "project_field",
+            "project_products",
+            "project_products_renditions",
+            "project_document",
+            "user",
+        ]
+
 
+class ProjectListSerializer(ProjectSerializer):
+    # List pages leave out the description and the product/document files.
+    class Meta(ProjectSerializer.Meta):
+        fields = [
+            "id",
+            "project_name",
+            "cover_image",
+            "cover_image_renditions",
+            "project_location",
+            "project_field",
+            "user",
+        ]
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChunkedUpload
+        fields = [
+            "id",
+            "project",
+            "filename",
+            "size",
+            "offset",
+            "sha256",
+            "created_at",
+            "completed_at",
+        ]
+        read_only_fields = ["offset", "sha256", "created_at", "completed_at"]
+
+    def validate_project(self, value):
+        if value.user_id != self.context["request"].user.id:
+            raise serializers.ValidationError("You can only upload documents to your own projects.")
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
@@ -1,3 +1,542 @@
-from django.test import TestCase
+import io
+import os
+import posixpath
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import unquote
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import ExifTags, Image
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api import hashing, otp, renderers
+from api.authentication import issue_tokens, user_cache_key
+from api.fastpath import compile_serializer
+from api.renderers import FastJSONParser, FastJSONRenderer
+from api.serializers import ProjectListSerializer, ProjectSerializer, UserSerializer, UserSummarySerializer
+from ideastar.cache import state_cache
+from ideastar.storage import HashedFileSystemStorage
+from ideastar.test_runner import IsolatedStorageMixin
+from projects.cache import reserve_entry
+from projects.models import ChunkedUpload, Project
+from users.models import Follow, User
+
+
+class OTPThrottleTests(TestCase):
+    def test_non_object_body_is_a_bad_request(self):
+        client = APIClient()
+        for url in ("/api/forgot-password/", "/api/verify-otp/", "/api/reset-password/"):
+            response = client.post(url, [1, 2], format="json")
+            self.assertEqual(response.status_code, 400, url)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "state": {"BACKEND": "ideastar.cache.DatabaseStateCache", "LOCATION": "test_state_cache"},
+})
+class StateCacheTests(TestCase):
+    def setUp(self):
+        call_command("createcachetable", verbosity=0)
+
+    def expires(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT expires FROM test_state_cache")
+            return cursor.fetchone()[0]
+
+    def test_incr_keeps_the_expiry(self):
+        self.assertTrue(state_cache.add("hits", 0, timeout=600))
+        self.assertFalse(state_cache.add("hits", 0, timeout=600))
+        expires = self.expires()
+        self.assertEqual([state_cache.incr("hits") for _ in range(3)], [1, 2, 3])
+        self.assertEqual(state_cache.get("hits"), 3)
+        self.assertEqual(self.expires(), expires)
+        with self.assertRaises(ValueError):
+            state_cache.incr("missing")
+
+    def test_otp_code_is_accepted_once(self):
+        code = otp.issue("someone@example.com")
+        self.assertTrue(otp.verify("someone@example.com", code))
+        self.assertFalse(otp.verify("someone@example.com", code))
+        self.assertTrue(otp.consume_verification("someone@example.com"))
+        self.assertFalse(otp.consume_verification("someone@example.com"))
+
+    def test_code_issued_during_a_verify_survives_it(self):
+        old = otp.issue("someone@example.com")
+        issued = []
+        delete = state_cache.delete
+
+        def reissue_then_delete(key, *args, **kwargs):
+            # A new code arrives between the verify's check and its delete.
+            if not issued:
+                issued.append(otp.issue("someone@example.com"))
+            return delete(key, *args, **kwargs)
+
+        with mock.patch.object(state_cache, "delete", side_effect=reissue_then_delete):
+            self.assertTrue(otp.verify("someone@example.com", old))
+        # The newer code replaces the verification and still works once.
+        self.assertFalse(otp.is_verified("someone@example.com"))
+        self.assertTrue(otp.verify("someone@example.com", issued[0]))
+        self.assertFalse(otp.verify("someone@example.com", old))
+        self.assertTrue(otp.consume_verification("someone@example.com"))
+
+
+
+class AuthenticationTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="someone@example.com", password="pw")
+        project = Project.objects.create(
+            user=self.user, project_name="n", project_description="d",
+            project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+        )
+        upload = ChunkedUpload.objects.create(user=self.user, project=project, filename="deck.pdf", size=10)
+        self.url = f"/api/uploads/{upload.pk}/"
+        self.refresh, access = issue_tokens(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_authenticated_requests_do_not_load_the_user(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual([query["sql"] for query in captured if '"users_user"' in query["sql"]], [])
+        self.assertNotIn("password", cache.get(user_cache_key(self.user.pk)))
+
+    def test_refresh_issues_a_working_access_token(self):
+        response = self.client.post("/api/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        self.assertEqual(client.get(self.url).status_code, 200)
+
+    def assertRejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        response = self.client.post("/api/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivated_user_is_rejected_once_forgotten(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected()
+
+    def test_deleted_user_is_rejected_once_forgotten(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.delete()
+        self.assertRejected()
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="someone@example.com", password="correct horse")
+
+    def login(self, url="/api/login/", password="correct horse"):
+        return APIClient().post(url, {"email": "someone@example.com", "password": password}, format="json")
+
+    def test_hash_from_an_older_hasher_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password("correct horse", hasher="pbkdf2_sha1"))
+        for url in ("/api/login/", "/api/async/login/"):
+            self.assertEqual(self.login(url).status_code, 200, url)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+
+    def test_failed_and_inactive_logins_go_through_authenticate(self):
+        failures = []
+        user_login_failed.connect(lambda credentials, **kwargs: failures.append(credentials["email"]), weak=False,
+                                  dispatch_uid="test-login-failed")
+        self.addCleanup(user_login_failed.disconnect, dispatch_uid="test-login-failed")
+        self.assertEqual(self.login(password="wrong").status_code, 400)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        for url in ("/api/login/", "/api/async/login/"):
+            self.assertEqual(self.login(url).status_code, 400, url)
+        self.assertEqual(failures, ["someone@example.com"] * 3)
+
+    def test_full_hashing_pool_answers_429(self):
+        with mock.patch.object(hashing, "_slots", threading.Semaphore(0)):
+            for url in ("/api/login/", "/api/async/login/"):
+                response = self.login(url)
+                self.assertEqual(response.status_code, 429, url)
+                self.assertEqual(response.headers["Retry-After"], "1")
+
+
+class ProjectCacheTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user(email="owner@example.com", password="pw")
+        self.project = Project.objects.create(
+            user=owner, project_name="n", project_description="d",
+            project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+        )
+        self.client = APIClient()
+
+    def test_matching_etag_is_answered_with_304(self):
+        url = f"/api/projects/{self.project.pk}/"
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+        self.assertEqual(self.client.get(url).headers["ETag"], etag)
+        self.assertNotEqual(self.client.get("/api/projects/").headers["ETag"], etag)
+
+        for header in (etag, f'W/{etag}', f'"other", {etag}'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_project_and_user_writes_invalidate_cached_responses(self):
+        url = f"/api/projects/{self.project.pk}/"
+        etag = self.client.get(url).headers["ETag"]
+
+        self.project.project_name = "renamed"
+        self.project.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["project_name"], "renamed")
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        etag = response.headers["ETag"]
+        owner = self.project.user
+        owner.first_name = "Ada"
+        owner.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    @override_settings(PROJECT_CACHE_MAX_ENTRIES=2)
+    def test_response_cache_is_bounded_per_version(self):
+        self.assertEqual([reserve_entry(1) for _ in range(3)], [True, True, False])
+        self.assertTrue(reserve_entry(2))
+
+    def test_cached_responses_do_not_touch_the_database_with_the_shipped_caches(self):
+        shipped = override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": os.path.join(self.media_root, "cache"),
+            },
+            "state": {"BACKEND": "ideastar.cache.DatabaseStateCache", "LOCATION": "test_state_cache"},
+        })
+        shipped.enable()
+        self.addCleanup(shipped.disable)
+        call_command("createcachetable", verbosity=0)
+
+        url = f"/api/projects/{self.project.pk}/"
+        etag = self.client.get(url).headers["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class FastPathTests(TestCase):
+    def setUp(self):
+        renditions = {
+            "source": "0" * 32,
+            "thumb": {"webp": "cover_images/renditions/a_thumb.webp", "avif": "cover_images/renditions/a_thumb.avif"},
+        }
+        with_image = User.objects.create_user(email="image@example.com", password="pw")
+        User.objects.filter(pk=with_image.pk).update(
+            profile_image="profile_images/a.png", profile_image_renditions=renditions, followers_count=3,
+        )
+        User.objects.create_user(email="plain@example.com", password="pw")
+        Project.objects.create(
+            user=with_image, project_name="with files", project_description="d",
+            project_location="KE", project_field="TECH", cover_image="cover_images/a.png",
+            cover_image_renditions=renditions, project_products="project_products/b.png",
+            project_document="project_documents/c.pdf",
+        )
+        Project.objects.create(
+            user=with_image, project_name="bare", project_description="d",
+            project_location="NG", project_field="AGRI", cover_image="cover_images/b.png",
+        )
+
+    def assertRendersLikeTheSerializer(self, serializer_class, query):
+        request = Request(APIRequestFactory().get("/api/", query))
+        context = {"request": request}
+        plan = compile_serializer(serializer_class(context=context))
+        self.assertIsNotNone(plan)
+        queryset = serializer_class.Meta.model.objects.order_by("pk")
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, context=context).data)
+        self.assertEqual(JSONRenderer().render(plan.render(queryset.values(*plan.columns))), expected)
+        return expected
+
+    def test_plans_render_the_same_bytes_as_the_serializers(self):
+        subsets = {
+            ProjectSerializer: "id,project_document,cover_image_renditions,user",
+            ProjectListSerializer: "project_name,cover_image",
+            UserSerializer: "email,profile_image_renditions",
+            UserSummarySerializer: "profile_image,followers_count",
+        }
+        for serializer_class, fields in subsets.items():
+            for query in ({}, {"fields": fields}, {"omit": "id"}):
+                with self.subTest(serializer=serializer_class.__name__, query=query):
+                    self.assertRendersLikeTheSerializer(serializer_class, query)
+
+        page = self.assertRendersLikeTheSerializer(ProjectSerializer, {})
+        # The page covers a null document, absolute file URLs and renditions.
+        self.assertIn(b'"project_document":null', page)
+        self.assertIn(b'"cover_image":"http://testserver/', page)
+        self.assertIn(b'"thumb":{"webp":"http://testserver/', page)
+
+
+class FollowPagingTests(TestCase):
+    def setUp(self):
+        self.star = User.objects.create_user(email="star@example.com", password="pw")
+        self.fans = [User.objects.create_user(email=f"fan{i}@example.com", password="pw") for i in range(7)]
+        Follow.objects.bulk_create([Follow(follower=fan, followed=self.star) for fan in self.fans])
+        Follow.objects.bulk_create([Follow(follower=self.star, followed=fan) for fan in self.fans])
+        # Follows made in the same instant tie on the cursor's ordering.
+        base = timezone.now()
+        for i, fan in enumerate(self.fans):
+            Follow.objects.filter(followed=fan).update(created_at=base - timedelta(seconds=i // 3))
+            Follow.objects.filter(follower=fan).update(created_at=base - timedelta(seconds=i // 3))
+
+    def walk(self, side):
+        url, pages = f"/api/users/{self.star.pk}/{side}/?page_size=3", []
+        while url:
+            with self.assertNumQueries(2):  # the user, then one page of follows
+                response = APIClient().get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertEqual(list(body["results"][0]), list(UserSummarySerializer.Meta.fields))
+            pages.append([user["id"] for user in body["results"]])
+            url = body["next"]
+        return pages
+
+    def test_pages_are_stable_and_complete(self):
+        for side in ("followers", "following"):
+            with self.subTest(side=side):
+                pages = self.walk(side)
+                self.assertEqual([len(page) for page in pages], [3, 3, 1])
+                ids = [pk for page in pages for pk in page]
+                self.assertCountEqual(ids, [fan.pk for fan in self.fans])
+                self.assertEqual(self.walk(side), pages)
+
+
+class SparseFieldsetTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="owner@example.com", password="pw")
+        self.project = Project.objects.create(
+            user=self.user, project_name="n", project_description="d",
+            project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def selects(self, url, table):
+        """The response and the SQL of each query reading ``table``."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [q["sql"] for q in queries if f'FROM "{table}"' in q["sql"]]
+
+    def test_unknown_field_is_rejected(self):
+        for url in (
+            f"/api/projects/{self.project.pk}/?fields=id,secret",
+            "/api/projects/?omit=secret",
+            f"/api/users/{self.user.pk}/?fields=password",
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("Unknown field", str(response.json()))
+
+    def test_select_list_narrows_to_the_requested_fields(self):
+        for url, table, kept, dropped in (
+            (f"/api/projects/{self.project.pk}/", "projects_project", "project_name", "project_description"),
+            ("/api/projects/", "projects_project", "project_name", "cover_image"),
+            (f"/api/users/{self.user.pk}/", "users_user", "email", "followers_count"),
+        ):
+            with self.subTest(url=url):
+                _, full = self.selects(url, table)
+                self.assertTrue(any(f'"{dropped}"' in sql for sql in full))
+
+                data, narrowed = self.selects(f"{url}?fields=id,{kept}", table)
+                row = data["results"][0] if "results" in data else data
+                self.assertEqual(set(row), {"id", kept})
+                self.assertTrue(narrowed)
+                self.assertFalse([sql for sql in narrowed if f'"{dropped}"' in sql])
+
+                data, omitted = self.selects(f"{url}?omit={dropped}", table)
+                row = data["results"][0] if "results" in data else data
+                self.assertNotIn(dropped, row)
+                self.assertFalse([sql for sql in omitted if f'"{dropped}"' in sql])
+
+
+class FastJSONTests(TestCase):
+    payload = {
+        "price": Decimal("12.50"),
+        "created_at": datetime(2026, 10, 18, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        "naive": datetime(2026, 10, 18, 9, 30),
+        "day": date(2026, 10, 18),
+        "at": time(9, 30, 15),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "label": gettext_lazy("Invalid credentials."),
+        "separators": "line\u2028paragraph\u2029 caf\u00e9",
+        "counts": {1: 2},
+        "nested": [None, True, 1.5, ["x"]],
+    }
+
+    def test_renders_the_same_bytes_as_drf(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        # Indented output is left to DRF.
+        indented = "application/json; indent=2"
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, indented), JSONRenderer().render(self.payload, indented)
+        )
+
+    def test_parses_like_drf(self):
+        body = JSONRenderer().render({"name": "caf\u00e9", "values": [1, 2.5, None], "nested": {"ok": True}})
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        for invalid in (b"{", b'{"a": NaN}'):
+            with self.subTest(body=invalid), self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(invalid))
+
+    def test_falls_back_to_drf_without_orjson(self):
+        body = JSONRenderer().render(self.payload)
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), body)
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _camera_jpeg():
+    """A 16x8 JPEG tagged as rotated 90 degrees, with a GPS position."""
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = 6
+    exif.get_ifd(ExifTags.IFD.GPSInfo)[ExifTags.GPS.GPSLatitude] = (1.0, 17.0, 0.0)
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 8), "blue").save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+ACCEL_PREFIX = "/protected-media/"
+
+
+@override_settings(MEDIA_SERVE_MODE="accel", MEDIA_ACCEL_REDIRECT_PREFIX=ACCEL_PREFIX)
+class MediaTests(IsolatedStorageMixin, TestCase):
+    """Runs serve_media behind a stand-in for nginx's internal location."""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(email="owner@example.com", password="pw")
+        self.other = User.objects.create_user(email="other@example.com", password="pw")
+        self.client = APIClient()
+        self.image = _png()
+        response = self.client.post("/api/projects/", {
+            "user": self.owner.pk,
+            "project_name": "p",
+            "project_description": "d",
+            "project_location": "KE",
+            "project_field": "TECH",
+            "cover_image": SimpleUploadedFile("Photo.PNG", self.image, "image/png"),
+            "project_document": SimpleUploadedFile("spec.pdf", b"%PDF-1.4 spec", "application/pdf"),
+        }, format="multipart")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.project = Project.objects.get(pk=response.json()["id"])
+
+    def proxy_get(self, url, user=None):
+        """GET ``url`` and, like nginx, answer an X-Accel-Redirect with the file."""
+        headers = {}
+        if user is not None:
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {issue_tokens(user)[1]}"
+        response = self.client.get(url, **headers)
+        target = response.headers.get("X-Accel-Redirect")
+        if target is None:
+            return response, None
+        self.assertTrue(target.startswith(ACCEL_PREFIX))
+        name = unquote(target.removeprefix(ACCEL_PREFIX))
+        with open(os.path.join(self.media_root, name), "rb") as fh:
+            return response, fh.read()
+
+    def test_public_image_is_handed_to_the_proxy_and_cached_forever(self):
+        response, body = self.proxy_get(self.project.cover_image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.image)
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertNotIn("Content-Type", response.headers)
+
+    def test_camera_metadata_is_stripped_from_public_images(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(f"/api/users/{self.owner.pk}/", {
+            "profile_image": SimpleUploadedFile("IMG_0001.jpg", _camera_jpeg(), "image/jpeg"),
+        }, format="multipart")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.client.force_authenticate(None)
+
+        body = self.proxy_get(User.objects.get(pk=self.owner.pk).profile_image.url)[1]
+        with Image.open(io.BytesIO(body)) as image:
+            self.assertEqual(dict(image.getexif()), {})
+            # Rotated into place before the orientation tag was dropped.
+            self.assertEqual(image.size, (8, 16))
+
+    def test_renditions_get_new_names_when_their_settings_change(self):
+        call_command("build_image_renditions", stdout=io.StringIO())
+        self.project.refresh_from_db()
+        thumb = self.project.cover_image_renditions["thumb"]["webp"]
+        response, body = self.proxy_get(f"/media/{thumb}")
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=31536000, immutable")
+
+        with override_settings(IMAGE_RENDITION_SIZES={"thumb": 4}):
+            call_command("build_image_renditions", "--force", stdout=io.StringIO())
+        self.project.refresh_from_db()
+        self.assertNotEqual(self.project.cover_image_renditions["thumb"]["webp"], thumb)
+        # The name clients may have cached still holds the same bytes.
+        self.assertEqual(self.proxy_get(f"/media/{thumb}")[1], body)
+
+        # Renditions named before their bytes were hashed may still change.
+        stem = posixpath.splitext(posixpath.basename(self.project.cover_image.name))[0]
+        legacy = posixpath.join(posixpath.dirname(thumb), f"{stem}_thumb.webp")
+        default_storage.save(legacy, ContentFile(body))
+        self.assertNotIn("immutable", self.proxy_get(f"/media/{legacy}")[0].headers["Cache-Control"])
+
+    def test_identical_upload_racing_a_save_shares_the_stored_file(self):
+        storage = HashedFileSystemStorage(location=self.media_root)
+        stored = storage.save("cover_images/a.png", ContentFile(self.image))
+        checks = []
+
+        def exists(name):
+            # The first check runs before the other request's copy landed.
+            checks.append(name)
+            return len(checks) > 1 and HashedFileSystemStorage.exists(storage, name)
+
+        with mock.patch.object(storage, "exists", exists):
+            self.assertEqual(storage.save("cover_images/b.png", ContentFile(self.image)), stored)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "cover_images")), [os.path.basename(stored)])
+
+    def test_document_is_served_to_its_owner_only(self):
+        url = self.project.project_document.url
+        self.assertEqual(self.proxy_get(url)[0].status_code, 401)
+        self.assertEqual(self.proxy_get(url, user=self.other)[0].status_code, 404)
+
+        response, body = self.proxy_get(url, user=self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b"%PDF-1.4 spec")
+        self.assertTrue(response.headers["Cache-Control"].startswith("private"))
+
+    def test_paths_outside_the_upload_directories_are_not_served(self):
+        for url in ("/media/../ideastar/settings.py", "/media/upload_chunks/x.part", "/media/ideastar/settings.py"):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
@@ -0,0 +1,107 @@
+"""Sliding-window rate limits.
+
+A sliding window is approximated with two fixed windows. The estimate is
+the current window's count plus the previous window's count, weighted by
+how much of it still overlaps the sliding window. Each check is one
+``add`` and one ``incr`` on the current counter and one ``get`` of the
+previous one, on the ``state`` cache, whose ``incr`` is atomic across
+processes (Redis, or a locked row without REDIS_URL). It stores two
+integers per client instead of DRF's list of timestamps, which is
+rewritten on every request. Rejected requests still count, so a flood
+stays rejected.
+"""
+import hashlib
+import time
+from collections.abc import Mapping
+
+from asgiref.sync import sync_to_async
+from rest_framework.throttling import SimpleRateThrottle
+
+from ideastar.cache import state_cache
+
+
+def hit(key, limit, window, cache=state_cache, now=None):
+    """Count a request against ``key``; return None if it is within
+    ``limit`` per ``window`` seconds, else the seconds to wait."""
+    now = time.time() if now is None else now
+    slot, elapsed = divmod(now, window)
+    current = f"{key}:{int(slot)}"
+    cache.add(current, 0, timeout=2 * window)
+    try:
+        count = cache.incr(current)
+    except ValueError:
+        # Expired between add() and incr().
+        cache.add(current, 1, timeout=2 * window)
+        count = 1
+    previous = cache.get(f"{key}:{int(slot) - 1}", 0)
+    if previous * (window - elapsed) / window + count <= limit:
+        return None
+    if count > limit:
+        return (window - elapsed) + window * (1 - limit / count)
+    return max(0.0, (window - elapsed) - (limit - count) * window / previous)
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    cache = state_cache
+
+    def allow_request(self, request, view):
+        ident = self.get_request_ident(request)
+        self._wait = self.check(ident)
+        return self._wait is None
+
+    def check(self, ident):
+        if self.rate is None or ident is None:
+            return None
+        key = self.cache_format % {"scope": self.scope, "ident": ident}
+        return hit(key, self.num_requests, self.duration, self.cache)
+
+    def wait(self):
+        return self._wait
+
+    def get_request_ident(self, request):
+        """The client address by default; return None to skip the throttle."""
+        return self.get_ident(request)
+
+
+class OTPAddressThrottle(SlidingWindowRateThrottle):
+    """Limits OTP requests per client address.
+
+    The address comes from DRF's ``get_ident``, which trusts the
+    ``X-Forwarded-For`` header unless ``NUM_PROXIES`` is set in
+    ``REST_FRAMEWORK``. Behind a proxy, set it to the number of proxies in
+    front of the app; otherwise clients can pick their own address by
+    sending the header and walk around this limit.
+    """
+
+    scope = "otp_address"
+
+
+class OTPEmailThrottle(SlidingWindowRateThrottle):
+    scope = "otp_email"
+
+    def get_request_ident(self, request):
+        # Bodies that are not an object fail validation with a 400 later.
+        if not isinstance(request.data, Mapping):
+            return None
+        return email_ident(request.data.get("email"))
+
+
+def email_ident(email):
+    if not isinstance(email, str) or not email:
+        return None
+    return hashlib.sha1(email.strip().lower().encode()).hexdigest()
+
+
+def otp_wait(request, email):
+    """Apply the OTP throttles outside DRF, for the async views. Returns
+    the longest wait, or None if the request is allowed."""
+    by_address, by_email = OTPAddressThrottle(), OTPEmailThrottle()
+    waits = [
+        wait
+        for wait in (by_address.check(by_address.get_ident(request)), by_email.check(email_ident(email)))
+        if wait is not None
+    ]
+    return max(waits) if waits else None
+
+
+aotp_wait = sync_to_async(otp_wait)
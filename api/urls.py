@@ -1,9 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from django.conf import settings
-from django.conf.urls.static import static
-from rest_framework.authtoken.views import obtain_auth_token
-from .views import ProjectViewSet
+from rest_framework_simplejwt.views import TokenRefreshView
+from . import async_views
+from .views import ProjectViewSet, ChunkedUploadViewSet
 from .views import (
     SignupView,
     LoginView,
@@ -16,19 +15,18 @@ from .views import (
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='users')
 router.register(r'projects', ProjectViewSet, basename='project')
+router.register(r'uploads', ChunkedUploadViewSet, basename='upload')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('login/', LoginView.as_view(), name='login'),
     path('register/', SignupView.as_view(), name='register'),
-    path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot-password'),
     path('verify-otp/', VerifyCodeView.as_view(), name='verify-otp'),
     path('reset-password/', ResetPasswordView.as_view(), name='reset-password'),
+    path('async/login/', async_views.login, name='async-login'),
+    path('async/forgot-password/', async_views.forgot_password, name='async-forgot-password'),
+    path('async/verify-otp/', async_views.verify_code, name='async-verify-otp'),
+    path('async/reset-password/', async_views.reset_password, name='async-reset-password'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
-
-
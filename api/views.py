@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -12,31 +13,51 @@ from django_rest_passwordreset.views import (
 from django_rest_passwordreset.models import ResetPasswordToken
 from .serializers import (
     UserSerializer,
+    UserSummarySerializer,
+    FollowRecommendationSerializer,
     FollowSerializer,
+    BulkFollowSerializer,
     SignupSerializer,
     LoginSerializer,
     ForgotPasswordSerializer,
     VerifyCodeSerializer,
     ResetPasswordSerializer,
     ProjectSerializer,
+    ProjectListSerializer,
+    ChunkedUploadSerializer,
 )
-from rest_framework import viewsets, permissions, parsers
-from users.models import User, Follow
-from django.core.cache import cache
+from rest_framework import viewsets, permissions, parsers, mixins
+from users.models import User, Follow, FollowRecommendation
+from users.follows import bulk_follow, bulk_unfollow
 from django.core.mail import send_mail, BadHeaderError
 from django.conf import settings
-from rest_framework_simplejwt.tokens import AccessToken
-from projects.models import Project
+from projects.models import Project, ChunkedUpload
+from projects import uploads
+from projects.search import search_projects
+from projects.facets import facet_counts
+from projects import timeline
+from . import hashing, otp
+from .authentication import issue_tokens
+from .caching import VersionedCacheMixin
+from .fastpath import FastPathListMixin, compile_serializer
+from .fieldsets import SparseFieldsetViewMixin, model_columns
+from .renderers import FastJSONParser
+from .throttling import OTPAddressThrottle, OTPEmailThrottle
+from .pagination import ProjectCursorPagination, FollowCursorPagination
 import secrets
 import string
 import smtplib
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetViewMixin, FastPathListMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    list_serializer_class = UserSummarySerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        return self.only_serialized(User.objects.all())
+
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=True)
@@ -44,16 +65,16 @@ class UserViewSet(viewsets.ModelViewSet):
         
         if 'password' in serializer.validated_data:
             password = serializer.validated_data.pop('password')
-            instance.set_password(password)
+            hashing.set_password(instance, password)
         self.perform_update(serializer)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def follow(self, request, pk=None):
         followed = self.get_object()
-        if request.user == followed:
+        if request.user.pk == followed.pk:
             return Response({"detail": "Cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
-        follow, created = Follow.objects.get_or_create(follower=request.user, followed=followed)
+        follow, created = Follow.objects.get_or_create(follower_id=request.user.pk, followed=followed)
         if created:
             return Response({"detail": "Followed successfully."}, status=status.HTTP_201_CREATED)
         return Response({"detail": "Already following."}, status=status.HTTP_200_OK)
@@ -61,25 +82,69 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def unfollow(self, request, pk=None):
         followed = self.get_object()
-        follow_qs = Follow.objects.filter(follower=request.user, followed=followed)
+        follow_qs = Follow.objects.filter(follower_id=request.user.pk, followed=followed)
         if follow_qs.exists():
             follow_qs.delete()
             return Response({"detail": "Unfollowed successfully."}, status=status.HTTP_200_OK)
         return Response({"detail": "Not following."}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=["post"], url_path="bulk-follow", permission_classes=[permissions.IsAuthenticated])
+    def bulk_follow(self, request):
+        serializer = BulkFollowSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        followed = bulk_follow(request.user.pk, serializer.validated_data["user_ids"])
+        timeline.invalidate(request.user.pk)
+        return Response({"followed": followed}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="bulk-unfollow", permission_classes=[permissions.IsAuthenticated])
+    def bulk_unfollow(self, request):
+        serializer = BulkFollowSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        unfollowed = bulk_unfollow(request.user.pk, serializer.validated_data["user_ids"])
+        timeline.invalidate(request.user.pk)
+        return Response({"unfollowed": unfollowed}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated])
+    def recommendations(self, request):
+        # Precomputed by `manage.py compute_recommendations`; anyone followed
+        # since the last run is filtered out here.
+        columns = [f"recommended__{name}" for name in UserSummarySerializer.Meta.fields]
+        recommendations = (
+            FollowRecommendation.objects.filter(user_id=request.user.pk)
+            .exclude(recommended__followers__follower_id=request.user.pk)
+            .select_related("recommended")
+            .only("score", "reason", *columns)
+            .order_by("-score")[:settings.FOLLOW_RECOMMENDATIONS_LIMIT]
+        )
+        serializer = FollowRecommendationSerializer(
+            recommendations, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
     @action(detail=True, methods=["get"], permission_classes=[permissions.AllowAny])
     def followers(self, request, pk=None):
         user = self.get_object()
-        followers = User.objects.filter(following__followed=user)
-        serializer = UserSerializer(followers, many=True)
-        return Response(serializer.data)
+        follows = Follow.objects.filter(followed=user).select_related("follower")
+        return self._follow_page(follows, "follower")
 
     @action(detail=True, methods=["get"], permission_classes=[permissions.AllowAny])
     def following(self, request, pk=None):
         user = self.get_object()
-        following = User.objects.filter(followers__follower=user)
-        serializer = UserSerializer(following, many=True)
-        return Response(serializer.data),
+        follows = Follow.objects.filter(follower=user).select_related("followed")
+        return self._follow_page(follows, "followed")
+
+    def _follow_page(self, follows, side):
+        context = self.get_serializer_context()
+        paginator = FollowCursorPagination()
+        plan = compile_serializer(UserSummarySerializer(context=context), prefix=f"{side}__")
+        if plan is not None:
+            page = paginator.paginate_queryset(follows.values("created_at", *plan.columns), self.request, view=self)
+            return paginator.get_paginated_response(plan.render(page))
+        columns = model_columns(UserSummarySerializer(context=context), prefix=f"{side}__")
+        page = paginator.paginate_queryset(follows.only("created_at", *columns), self.request, view=self)
+        users = [getattr(follow, side) for follow in page]
+        serializer = UserSummarySerializer(users, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
 
 
 
@@ -94,9 +159,10 @@ class LoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
-        access = AccessToken.for_user(user)
+        refresh, access = issue_tokens(user)
         return Response({
             "access": str(access),
+            "refresh": str(refresh),
             "user": {
                 "id": user.id,
                 "email": user.email,
@@ -108,18 +174,19 @@ class LoginView(generics.GenericAPIView):
 
 class ForgotPasswordView(generics.GenericAPIView):
     serializer_class = ForgotPasswordSerializer
-    permission_classes = [AllowAny]   
+    permission_classes = [AllowAny]
+    throttle_classes = [OTPAddressThrottle, OTPEmailThrottle]
+
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data["email"]
-        user = User.objects.get(email=email)
-        otp = cache.get(f"otp_{user.id}")
+        code = otp.issue(email)
         send_mail(
             "Your OTP Code",
-            f"Use this OTP to reset your password: {otp}",
+            f"Use this OTP to reset your password: {code}",
             settings.DEFAULT_FROM_EMAIL,
-            [user.email],
+            [email],
             fail_silently=False,
         )
         return Response({"message": "OTP sent to your email"})
@@ -127,18 +194,11 @@ class ForgotPasswordView(generics.GenericAPIView):
 class VerifyCodeView(generics.GenericAPIView):
     serializer_class = VerifyCodeSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [OTPAddressThrottle, OTPEmailThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        email = serializer.validated_data.get("email")
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({"detail": "Invalid email."}, status=status.HTTP_400_BAD_REQUEST)
-        cache.delete(f"otp_{user.id}")
-        cache.set(f"otp_verified_{user.id}", True, timeout=300) 
-
         return Response({"message": "OTP verified successfully"}, status=status.HTTP_200_OK)
 
 
@@ -146,25 +206,128 @@ class VerifyCodeView(generics.GenericAPIView):
 class ResetPasswordView(generics.GenericAPIView):
     serializer_class = ResetPasswordSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [OTPAddressThrottle, OTPEmailThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        email = serializer.validated_data.get("email")
         try:
-            user = User.objects.get(email=email)
+            user = serializer.save()
         except User.DoesNotExist:
             return Response({"detail": "Invalid email."}, status=status.HTTP_400_BAD_REQUEST)
-        if not cache.get(f"otp_verified_{user.id}"):
+        if user is None:
             return Response({"detail": "OTP not verified or expired."}, status=status.HTTP_400_BAD_REQUEST)
-        serializer.save()
-        cache.delete(f"otp_verified_{user.id}")
 
         return Response({"message": "Password has been reset successfully"}, status=status.HTTP_200_OK)
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(SparseFieldsetViewMixin, VersionedCacheMixin, FastPathListMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    list_serializer_class = ProjectListSerializer
+    list_actions = ("list", "feed", "search")
     permission_classes = [permissions.AllowAny]  
-    parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
+    parser_classes = [parsers.MultiPartParser, parsers.FormParser, FastJSONParser]
+    pagination_class = ProjectCursorPagination
+
+    def get_queryset(self):
+        # `user` is rendered as a primary key, read straight from the user_id
+        # column, so only the serialized columns are loaded and no join is needed.
+        queryset = self.only_serialized(Project.objects.all())
+        if self.action == "list":
+            for param in ("project_field", "project_location"):
+                value = self.request.query_params.get(param)
+                if value:
+                    queryset = queryset.filter(**{param: value})
+        return queryset
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        return self._cached(lambda: Response(facet_counts(
+            project_field=request.query_params.get("project_field"),
+            project_location=request.query_params.get("project_location"),
+        )))
+
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        paginator = self.paginator
+        try:
+            before = request.query_params.get("before")
+            before = int(before) if before else None
+        except ValueError:
+            return Response({"detail": "before must be a project id."}, status=status.HTTP_400_BAD_REQUEST)
+        projects, next_before = timeline.timeline_page(
+            request.user.pk,
+            queryset=self.get_queryset(),
+            before=before,
+            limit=paginator.get_page_size(request),
+        )
+        next_url = None
+        if next_before is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), "before", next_before)
+        serializer = self.get_serializer(projects, many=True)
+        return Response({"next": next_url, "results": serializer.data})
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        return self._cached(lambda: self._search(request))
+
+    def _search(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(int(request.query_params.get("limit", 20)), 100)
+            offset = max(int(request.query_params.get("offset", 0)), 0)
+        except ValueError:
+            return Response({"detail": "limit and offset must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        projects = search_projects(
+            query,
+            queryset=self.get_queryset(),
+            project_field=request.query_params.get("project_field"),
+            project_location=request.query_params.get("project_location"),
+            limit=limit + 1,
+            offset=offset,
+        )
+        next_url = None
+        if len(projects) > limit:
+            projects = projects[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), "offset", offset + limit)
+        serializer = self.get_serializer(projects, many=True)
+        return Response({"next": next_url, "results": serializer.data})
+
+
+class ChunkedUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Resumable project document uploads.
+
+    POST creates an upload for a project, GET reports the current offset
+    so an interrupted client can resume, and PATCH appends the raw request
+    body at the offset given in the ``Upload-Offset`` header. The document
+    is attached to the project once the final byte has been received.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user_id=self.request.user.pk)
+
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.pk)
+
+    def partial_update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers["Upload-Offset"])
+        except (KeyError, ValueError):
+            return Response({"detail": "Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            uploads.append_chunk(upload, offset, request.stream)
+        except uploads.UploadCompleted as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except uploads.OffsetMismatch as exc:
+            return Response(
+                {"detail": str(exc), "offset": exc.expected},
+                status=status.HTTP_409_CONFLICT,
+                headers={"Upload-Offset": str(exc.expected)},
+            )
+        serializer = self.get_serializer(upload)
+        return Response(serializer.data, headers={"Upload-Offset": str(upload.offset)})
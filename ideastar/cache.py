@@ -0,0 +1,65 @@
+"""The ``state`` cache: short-lived records that must stay exact.
+
+OTP codes, rate-limit windows and timeline locks rely on atomic
+``add``, ``incr`` and ``delete`` across every process, and on never
+being evicted to make room. None of them is read on a cached project
+GET. Redis provides that
+when REDIS_URL is set. Without it, ``state`` falls back to
+``DatabaseStateCache`` instead of the file cache, whose ``add`` and
+``incr`` are read-then-write and which culls random keys when full.
+
+The fallback's table is created by ``migrate`` (see ``create_cache_tables``).
+"""
+import base64
+import pickle
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.utils.connection import ConnectionProxy
+
+state_cache = ConnectionProxy(caches, "state")
+
+
+class DatabaseStateCache(DatabaseCache):
+    """``DatabaseCache`` with an atomic ``incr``.
+
+    ``add`` and ``delete`` are already atomic there (a unique key and a
+    row count). ``incr`` reads and rewrites the row in one transaction,
+    locking it with ``SELECT ... FOR UPDATE`` where the database supports
+    that; on SQLite the IMMEDIATE transaction mode in settings takes the
+    write lock up front instead. The entry keeps its expiry.
+    """
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        lock = " FOR UPDATE" if connection.features.has_select_for_update else ""
+        now = datetime.now(timezone.utc) if settings.USE_TZ else datetime.now()
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {quote_name('value')} FROM {table} "
+                f"WHERE {quote_name('cache_key')} = %s AND {quote_name('expires')} > %s{lock}",
+                [cache_key, connection.ops.adapt_datetimefield_value(now.replace(microsecond=0))],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found.")
+            value = pickle.loads(base64.b64decode(connection.ops.process_clob(row[0]).encode())) + delta
+            cursor.execute(
+                f"UPDATE {table} SET {quote_name('value')} = %s WHERE {quote_name('cache_key')} = %s",
+                [base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode("latin1"), cache_key],
+            )
+        return value
+
+
+def create_cache_tables(using=DEFAULT_DB_ALIAS, **kwargs):
+    """``post_migrate`` receiver: create the tables of database-backed
+    caches, so ``migrate`` is the only setup step."""
+    call_command("createcachetable", database=using, verbosity=0)
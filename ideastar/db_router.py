@@ -0,0 +1,92 @@
+"""Primary/replica database routing with read-your-writes stickiness.
+
+Writes always go to ``default``. Reads made while serving an HTTP
+request go to a random ``replica_*`` alias unless the request is pinned
+to the primary; management commands, migrations and background workers
+always read from the primary. A request is pinned
+if it is unsafe (POST, PATCH, ...), if it has already written, or if the
+same client wrote within the last ``DATABASE_REPLICA_PIN_SECONDS``. The
+last case covers replication lag: a user who just followed someone or
+edited their profile sees the change on the next read.
+
+That last pin travels with the client as a short-lived signed cookie, so
+it holds whichever web worker serves the next request and costs no
+cache round trip. Clients that drop cookies are only pinned for their
+own unsafe requests.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = "default"
+# Outside ReplicaPinningMiddleware everything stays on the primary.
+_pinned = ContextVar("db_pinned_to_primary", default=True)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica_")]
+
+
+class PrimaryReplicaRouter:
+    def __init__(self):
+        self.replicas = replica_aliases()
+
+    def db_for_read(self, model, **hints):
+        # The database-backed state cache must not lag behind its writes.
+        if _pinned.get() or not self.replicas or model._meta.app_label == "django_cache":
+            return PRIMARY
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaPinningMiddleware:
+    """Pin reads to the primary around writes; see the module docstring."""
+
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+    cookie_name = "db_pin"
+    cookie_salt = "ideastar.db_router.pin"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _recently_wrote(self, request):
+        return bool(request.get_signed_cookie(
+            self.cookie_name,
+            default=None,
+            salt=self.cookie_salt,
+            max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+        ))
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+
+        pinned = request.method not in self.safe_methods or self._recently_wrote(request)
+        token = _pinned.set(pinned)
+        try:
+            response = self.get_response(request)
+            wrote = _pinned.get() and request.method not in self.safe_methods
+        finally:
+            _pinned.reset(token)
+
+        if wrote and response.status_code < 400:
+            response.set_signed_cookie(
+                self.cookie_name,
+                "1",
+                salt=self.cookie_salt,
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,168 @@
+"""Resized, re-encoded renditions for uploaded images.
+
+Originals are stored at their full size, but without metadata: the
+storage passes public uploads through ``strip_metadata`` first, since
+camera EXIF can carry the GPS position a photo was taken at and the
+originals are served publicly. Saving a new upload queues an
+``images.build_renditions`` job (see ``jobs``), which decodes the original
+once, applies its EXIF orientation, and writes one file per size and
+format in ``IMAGE_RENDITION_SIZES`` / ``IMAGE_RENDITION_FORMATS``. The
+re-encoded files carry no EXIF data and are named after their bytes, so
+they can be cached forever like the originals; renditions superseded by a
+settings change are left in place for rows that still point at them.
+Their storage paths are saved on the model's ``<field>_renditions``
+JSONField, keyed by the original's name so that stale results are never
+applied to a newer upload.
+
+The job is registered here rather than in an app's ``tasks`` module; the
+users and projects signal handlers import this module at startup.
+"""
+import hashlib
+import io
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.dispatch import Signal
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError, features
+
+from jobs.queue import enqueue, register
+
+# Sent with the model and pk once new renditions have been saved. The
+# save uses QuerySet.update(), so no post_save is sent for it.
+renditions_built = Signal()
+
+# Hex digits of the encoded bytes in a rendition's name.
+RENDITION_HASH_LENGTH = 12
+
+_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", {"quality": 60}),
+}
+
+
+# Format an original is written back in when its metadata is stripped.
+# Phone cameras produce MPO files, JPEGs with extra frames; the first
+# frame is the photo.
+_STRIPPED_FORMATS = {"JPEG": "JPEG", "MPO": "JPEG", "PNG": "PNG", "WEBP": "WEBP"}
+
+
+def _has_metadata(image):
+    return bool(image.getexif()) or any(key in image.info for key in ("xmp", "XML:com.adobe.xmp", "comment"))
+
+
+def strip_metadata(content):
+    """Return ``content`` re-encoded without EXIF, XMP or comments.
+
+    The EXIF orientation is applied to the pixels first, so the image
+    still displays the right way up. A JPEG that needs no rotation keeps
+    its quantization tables and is not visibly recompressed. Content that
+    is not an image, or carries no metadata, is returned unchanged.
+    """
+    content.seek(0)
+    try:
+        with Image.open(content) as image:
+            pil_format = _STRIPPED_FORMATS.get(image.format)
+            if pil_format is None or not _has_metadata(image):
+                return content
+            options = {"icc_profile": image.info.get("icc_profile")}
+            if pil_format != "JPEG" and getattr(image, "is_animated", False):
+                # Frames are written as they are; only stills are rotated.
+                options["save_all"] = True
+            elif image.getexif().get(ExifTags.Base.Orientation, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+            elif pil_format == "JPEG":
+                options.update(quality="keep", subsampling="keep")
+            if pil_format in ("JPEG", "WEBP"):
+                options.setdefault("quality", 90)
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        return content
+    finally:
+        content.seek(0)
+    return ContentFile(buffer.getvalue(), name=content.name)
+
+
+def rendition_formats():
+    return [fmt for fmt in settings.IMAGE_RENDITION_FORMATS if features.check(fmt)]
+
+
+def rendition_path(name, size, fmt, content):
+    """Path of a rendition of ``name``, named after its encoded ``content``.
+
+    The digest changes whenever the sizes, formats, quality or encoder
+    produce different bytes, so a name served as immutable never holds
+    two different files.
+    """
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    digest = hashlib.sha256(content).hexdigest()[:RENDITION_HASH_LENGTH]
+    return posixpath.join(directory, "renditions", f"{stem}_{size}_{digest}.{fmt}")
+
+
+def build_renditions(field_file):
+    """Write every rendition of ``field_file`` and return their paths."""
+    storage = field_file.storage
+    renditions = {"source": field_file.name}
+    with storage.open(field_file.name, "rb") as fh, Image.open(fh) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for size, edge in settings.IMAGE_RENDITION_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            renditions[size] = {}
+            for fmt in rendition_formats():
+                pil_format, options = _FORMATS[fmt]
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                content = buffer.getvalue()
+                path = rendition_path(field_file.name, size, fmt, content)
+                renditions[size][fmt] = storage.save_shared(path, ContentFile(content))
+    return renditions
+
+
+# Pillow releases the GIL while resampling and encoding, so the job runs
+# well on the worker's thread pool. It writes files, so it is not run in
+# a transaction.
+@register("images.build_renditions", atomic=False)
+def build_field_renditions(model, pk, field_name):
+    model = apps.get_model(model)
+    instance = model.objects.only(field_name).filter(pk=pk).first()
+    field_file = getattr(instance, field_name, None)
+    # Nothing to do if the row or its file has gone since the job was queued.
+    if not field_file or not field_file.storage.exists(field_file.name):
+        return
+    renditions = build_renditions(field_file)
+    # Only apply the result if the field still points at the same file.
+    updated = model.objects.filter(pk=pk, **{field_name: field_file.name}).update(
+        **{f"{field_name}_renditions": renditions}
+    )
+    if updated:
+        renditions_built.send(sender=model, pk=pk)
+
+
+def schedule_renditions(instance, field_names, update_fields=None):
+    """Queue rendition builds for any of ``field_names`` whose file changed."""
+    model = type(instance)
+    deferred = instance.get_deferred_fields()
+    for field_name in field_names:
+        if field_name in deferred or (update_fields is not None and field_name not in update_fields):
+            continue
+        field_file = getattr(instance, field_name)
+        renditions = getattr(instance, f"{field_name}_renditions") or {}
+        if not field_file:
+            if renditions:
+                model.objects.filter(pk=instance.pk).update(**{f"{field_name}_renditions": {}})
+        elif renditions.get("source") != field_file.name:
+            label = model._meta.label
+            enqueue(
+                "images.build_renditions",
+                idempotency_key=f"renditions:{label}:{instance.pk}:{field_name}:{field_file.name}",
+                model=label,
+                pk=instance.pk,
+                field_name=field_name,
+            )
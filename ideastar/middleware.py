@@ -0,0 +1,149 @@
+import logging
+from collections import Counter
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+# Already-compressed media (images, PDFs, archives) is sent as-is.
+re_compressible_type = _lazy_re_compile(r"^(text/|application/(json|javascript|xml)|image/svg\+xml)")
+
+
+class QueryStats:
+    """``execute_wrapper`` that counts and times every SQL statement."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+class QueryStatsMiddleware:
+    """Report per-request query count, DB time, render time and size.
+
+    The numbers are sent in a ``Server-Timing`` header and logged on the
+    ``ideastar.middleware`` logger. Any statement that runs at least
+    ``QUERY_STATS_N_PLUS_ONE_THRESHOLD`` times in one request is logged
+    as a likely N+1 pattern. Enabled by ``QUERY_STATS_ENABLED``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_STATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request._render_time = 0.0
+        start = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = perf_counter() - start
+
+        view = request.resolver_match.view_name if request.resolver_match else request.path
+        size = None if response.streaming else len(response.content)
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+            f"render;dur={request._render_time * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+        logger.info(
+            "%s %s view=%s status=%s queries=%d db_ms=%.1f render_ms=%.1f total_ms=%.1f bytes=%s",
+            request.method, request.path, view, response.status_code, stats.count,
+            stats.duration * 1000, request._render_time * 1000, total * 1000, size,
+        )
+        for sql, times in stats.repeated(settings.QUERY_STATS_N_PLUS_ONE_THRESHOLD):
+            logger.warning("Possible N+1 in %s: statement ran %d times: %s", view, times, sql[:300])
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that step.
+        started = perf_counter()
+
+        def record(rendered):
+            request._render_time = perf_counter() - started
+
+        response.add_post_render_callback(record)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli or gzip response compression above a size threshold.
+
+    Only text-like content types are compressed, and bodies shorter than
+    ``COMPRESSION_MIN_SIZE`` bytes are sent as-is, since compressing them
+    costs more than it saves. Streaming responses are
+    compressed chunk by chunk. Brotli is used when the ``brotli`` package is
+    installed and the client accepts it; otherwise this is Django's
+    ``GZipMiddleware``.
+    """
+
+    def process_response(self, request, response):
+        if not re_compressible_type.match(response.get("Content-Type", "")):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if (
+            brotli is None
+            or response.has_header("Content-Encoding")
+            or not re_accepts_brotli.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        quality = settings.COMPRESSION_BROTLI_QUALITY
+        if response.streaming:
+            original_iterator = response.streaming_content
+            if response.is_async:
+                async def brotli_wrapper():
+                    compressor = brotli.Compressor(quality=quality)
+                    async for chunk in original_iterator:
+                        yield compressor.process(chunk) + compressor.flush()
+                    yield compressor.finish()
+            else:
+                def brotli_wrapper():
+                    compressor = brotli.Compressor(quality=quality)
+                    for chunk in original_iterator:
+                        yield compressor.process(chunk) + compressor.flush()
+                    yield compressor.finish()
+            response.streaming_content = brotli_wrapper()
+            del response.headers["Content-Length"]
+        else:
+            compressed_content = brotli.compress(response.content, quality=quality)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers["Content-Length"] = str(len(response.content))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
@@ -23,7 +23,6 @@ DEBUG = os.getenv('DEBUG', 'False').lower() in ['true', '1', 'yes']
 load_dotenv()
 
 SECRET_KEY = os.environ.get('SECRET_KEY', 'fallback-insecure-key-for-dev-only')
-DEBUG = True
 ALLOWED_HOSTS = ["*"]
 
 
@@ -40,13 +39,19 @@ INSTALLED_APPS = [
     'django_rest_passwordreset', 
     'rest_framework_simplejwt',
     'rest_framework',
+    'api',
     'users',
     'projects',
+    'mailqueue',
+    'jobs',
     'django_countries',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ideastar.middleware.QueryStatsMiddleware',
+    'ideastar.middleware.CompressionMiddleware',
+    'ideastar.db_router.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,24 +60,63 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL count/time reporting (ideastar/middleware.py).
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", str(DEBUG)).lower() in ['true', '1', 'yes']
+QUERY_STATS_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_STATS_N_PLUS_ONE_THRESHOLD", 5))
+
+# Responses smaller than this many bytes are not compressed; brotli is used
+# over gzip when the `brotli` package is installed.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
 AUTH_USER_MODEL = 'users.User'
+# Checks passwords on the bounded hashing pool (api/hashing.py).
+AUTHENTICATION_BACKENDS = ['api.backends.HashingPoolBackend']
 
 REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "api.authentication.StatelessJWTAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+    ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer",
+        "api.renderers.FastJSONRenderer",
+        *(["rest_framework.renderers.BrowsableAPIRenderer"] if DEBUG else []),
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
+    # Sliding-window limits on the OTP endpoints (see api/throttling.py).
+    "DEFAULT_THROTTLE_RATES": {
+        "otp_address": os.getenv("OTP_ADDRESS_RATE", "60/hour"),
+        "otp_email": os.getenv("OTP_EMAIL_RATE", "10/hour"),
+    },
+    # Number of proxies in front of the app. Unset, client addresses (and
+    # so the otp_address limit) trust a spoofable X-Forwarded-For header.
+    "NUM_PROXIES": int(os.environ["NUM_PROXIES"]) if os.getenv("NUM_PROXIES") else None,
 }
 
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_USER_CLASS': 'api.authentication.ClaimsUser',
+    'TOKEN_REFRESH_SERIALIZER': 'api.serializers.TokenRefreshSerializer',
 }
 
+# Seconds the columns JWT requests check (is_active and a few profile
+# fields, see api/authentication.py) stay cached; 0 trusts the token claims.
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 60))
+
+# Password-reset codes (api/otp.py): how long a sent code is valid, and how
+# long a verified code may be used to reset the password.
+OTP_TIMEOUT = int(os.getenv("OTP_TIMEOUT", 600))
+OTP_VERIFIED_TIMEOUT = int(os.getenv("OTP_VERIFIED_TIMEOUT", 300))
+
 ROOT_URLCONF = 'ideastar.urls'
 
 TEMPLATES = [
@@ -100,14 +144,149 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL lets feed reads proceed while follows and counter updates
+        # write. Write transactions take the lock up front (IMMEDIATE) and
+        # wait up to `timeout` seconds for it instead of failing with
+        # "database is locked" halfway through.
+        'OPTIONS': {
+            'timeout': int(os.getenv("SQLITE_BUSY_TIMEOUT", 20)),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 ** 2))};"
+                f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_KIB', 64 * 1024))};"
+                "PRAGMA temp_store=MEMORY;"
+            ),
+        },
     }
 }
 
+# Production profile: DB_ENGINE=postgres uses PostgreSQL with persistent
+# connections (or a psycopg pool with DB_POOL_MAX_SIZE), plus one read
+# replica alias per host in POSTGRES_REPLICA_HOSTS.
+if os.getenv("DB_ENGINE") == "postgres":
+    def _postgres(host):
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("POSTGRES_DB", "ideastar"),
+            'USER': os.getenv("POSTGRES_USER", "ideastar"),
+            'PASSWORD': os.getenv("POSTGRES_PASSWORD", ""),
+            'HOST': host,
+            'PORT': os.getenv("POSTGRES_PORT", "5432"),
+            'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+        pool_size = int(os.getenv("DB_POOL_MAX_SIZE", 0))
+        if pool_size:
+            # Django's pool replaces persistent connections.
+            database['CONN_MAX_AGE'] = 0
+            database['OPTIONS']['pool'] = {'min_size': 1, 'max_size': pool_size}
+        return database
+
+    DATABASES = {'default': _postgres(os.getenv("POSTGRES_HOST", "localhost"))}
+    replica_hosts = [host.strip() for host in os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",") if host.strip()]
+    for index, host in enumerate(replica_hosts):
+        DATABASES[f'replica_{index}'] = {**_postgres(host), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['ideastar.db_router.PrimaryReplicaRouter']
+# How long a client's reads stay on the primary after it writes.
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("DATABASE_REPLICA_PIN_SECONDS", 5))
+
+# Caches shared by every process: web workers, `run_jobs` and management
+# commands all read and write them, so a per-process LocMemCache is not
+# supported. `default` holds data that can be rebuilt (cached project
+# responses and their version, home timelines, authenticated users);
+# `state` holds records that must stay exact and must not be evicted (OTP
+# codes, rate-limit windows, timeline locks; see ideastar/cache.py).
+# Set REDIS_URL in production, and always when the app runs on more than one
+# host. Without it, `default` is a file cache in CACHE_DIR and `state` a
+# table in the primary database, created by `migrate`.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'state': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'state',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv("CACHE_DIR", str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv("CACHE_MAX_ENTRIES", 10000))},
+        },
+        'state': {
+            'BACKEND': 'ideastar.cache.DatabaseStateCache',
+            'LOCATION': 'ideastar_state_cache',
+            # Expired rows are purged first; live ones are never culled below this.
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv("STATE_CACHE_MAX_ENTRIES", 1000000))},
+        },
+    }
+# `manage.py test` swaps in a private cache (ideastar/test_runner.py).
+TEST_RUNNER = 'ideastar.test_runner.TestRunner'
+
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 SITE_ID = 1
 
 
+# Worker threads for password hashing, and how many more requests may wait
+# for one before new logins/signups are refused with 429.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", os.cpu_count() or 2))
+PASSWORD_HASHING_QUEUE = int(os.getenv("PASSWORD_HASHING_QUEUE", PASSWORD_HASHING_WORKERS * 2))
+
+
+# Resized WebP/AVIF renditions built for uploaded profile and project images.
+IMAGE_RENDITION_SIZES = {"thumb": 160, "medium": 640, "large": 1280}
+IMAGE_RENDITION_FORMATS = os.getenv("IMAGE_RENDITION_FORMATS", "webp,avif").split(",")
+
+
+# Housekeeping expiry for cached project responses. Invalidation itself is
+# version-based (projects/cache.py), so this only bounds memory use.
+PROJECT_CACHE_TIMEOUT = int(os.getenv("PROJECT_CACHE_TIMEOUT", 24 * 60 * 60))
+# Responses stored per cache version. Past it, responses are served uncached
+# until the next write, so varying query strings cannot grow the cache.
+PROJECT_CACHE_MAX_ENTRIES = int(os.getenv("PROJECT_CACHE_MAX_ENTRIES", 5000))
+
+# Bulk follow/unfollow: ids accepted per request and per INSERT/UPDATE batch.
+BULK_FOLLOW_MAX_IDS = int(os.getenv("BULK_FOLLOW_MAX_IDS", 1000))
+BULK_FOLLOW_BATCH_SIZE = int(os.getenv("BULK_FOLLOW_BATCH_SIZE", 500))
+
+# Home timelines (projects/timeline.py): accounts with more followers than
+# TIMELINE_FANOUT_MAX_FOLLOWERS are merged in at read time instead of pushed.
+TIMELINE_MAX_LENGTH = int(os.getenv("TIMELINE_MAX_LENGTH", 800))
+TIMELINE_FANOUT_MAX_FOLLOWERS = int(os.getenv("TIMELINE_FANOUT_MAX_FOLLOWERS", 10000))
+TIMELINE_TIMEOUT = int(os.getenv("TIMELINE_TIMEOUT", 7 * 24 * 60 * 60))
+
+# "Who to follow" (users/recommendations.py): rows stored per user by
+# `manage.py compute_recommendations`, and the most served per request.
+FOLLOW_RECOMMENDATIONS_TOP_K = int(os.getenv("FOLLOW_RECOMMENDATIONS_TOP_K", 50))
+FOLLOW_RECOMMENDATIONS_LIMIT = int(os.getenv("FOLLOW_RECOMMENDATIONS_LIMIT", 20))
+
+# Background jobs (jobs/): side effects queued by signals and run by
+# `manage.py run_jobs`. JOBS_EAGER runs them inline instead (tests).
+JOBS_EAGER = os.getenv("JOBS_EAGER", "False").lower() in ['true', '1', 'yes']
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", 4))
+JOBS_BATCH_SIZE = int(os.getenv("JOBS_BATCH_SIZE", 50))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+JOBS_RETRY_BASE_SECONDS = int(os.getenv("JOBS_RETRY_BASE_SECONDS", 10))
+JOBS_RETRY_MAX_SECONDS = int(os.getenv("JOBS_RETRY_MAX_SECONDS", 3600))
+# A running job older than this is assumed lost and queued again.
+JOBS_LOCK_TIMEOUT = int(os.getenv("JOBS_LOCK_TIMEOUT", 15 * 60))
+
+# Resumable project document uploads (see projects/uploads.py).
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_SIZE", 2 * 1024 ** 3))
+CHUNKED_UPLOAD_BUFFER_SIZE = 1024 * 1024
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -144,6 +323,23 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded media. Existing uploads live in the project root, so that stays
+# the default MEDIA_ROOT; only the directories below are ever served (see
+# api/media.py), private ones to authenticated requests only.
+MEDIA_URL = os.getenv("MEDIA_URL", "/media/")
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", str(BASE_DIR))
+MEDIA_PUBLIC_DIRS = ("profile_images", "cover_images", "project_products")
+MEDIA_PRIVATE_DIRS = ("project_documents",)
+
+# "accel" (nginx X-Accel-Redirect), "sendfile" (X-Sendfile) or "django".
+MEDIA_SERVE_MODE = os.getenv("MEDIA_SERVE_MODE", "django")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
+STORAGES = {
+    "default": {"BACKEND": "ideastar.storage.HashedFileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -152,7 +348,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Email configuration for real email sending
 import os
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Outbound mail is queued in the database and delivered by the
+# "mailqueue.deliver" job (or `manage.py send_queued_mail`) using
+# MAILQUEUE_DELIVERY_BACKEND.
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "mailqueue.backends.QueuedEmailBackend")
+MAILQUEUE_DELIVERY_BACKEND = os.getenv("MAILQUEUE_DELIVERY_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+MAILQUEUE_BATCH_SIZE = int(os.getenv("MAILQUEUE_BATCH_SIZE", 50))
+MAILQUEUE_MAX_ATTEMPTS = int(os.getenv("MAILQUEUE_MAX_ATTEMPTS", 5))
+# How long a claimed message stays reserved for the worker sending it.
+MAILQUEUE_LEASE_SECONDS = int(os.getenv("MAILQUEUE_LEASE_SECONDS", 300))
+MAILQUEUE_RETRY_BASE_SECONDS = int(os.getenv("MAILQUEUE_RETRY_BASE_SECONDS", 30))
+MAILQUEUE_RETRY_MAX_SECONDS = int(os.getenv("MAILQUEUE_RETRY_MAX_SECONDS", 3600))
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
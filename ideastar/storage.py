@@ -0,0 +1,64 @@
+"""Content-addressed names for user uploads.
+
+Files saved directly into one of the upload directories
+(``MEDIA_PUBLIC_DIRS`` / ``MEDIA_PRIVATE_DIRS``) are renamed to a hash of
+their content, keeping the extension. A given name therefore always holds
+the same bytes and can be cached forever. Uploading an identical file
+again reuses the stored copy. Other paths, such as renditions and
+``upload_chunks/``, keep the name they were given.
+
+Images saved into ``MEDIA_PUBLIC_DIRS`` have their metadata stripped
+before they are hashed (see ``ideastar.images.strip_metadata``).
+"""
+import hashlib
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from ideastar.images import RENDITION_HASH_LENGTH, strip_metadata
+
+HASH_LENGTH = 32
+
+# Stems written here or by projects.uploads, optionally followed by a
+# rendition's size and the digest of its own bytes (see ideastar.images).
+_HASHED_NAME_RE = re.compile(
+    rf"^[0-9a-f]{{32}}(?:[0-9a-f]{{32}})?(?:_[a-z0-9]+_[0-9a-f]{{{RENDITION_HASH_LENGTH}}})?\.[A-Za-z0-9]+$"
+)
+
+
+def is_content_hashed(name):
+    return bool(_HASHED_NAME_RE.match(posixpath.basename(name)))
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        directory, filename = posixpath.split(name)
+        if directory in settings.MEDIA_PUBLIC_DIRS:
+            content = strip_metadata(content)
+        if directory in (*settings.MEDIA_PUBLIC_DIRS, *settings.MEDIA_PRIVATE_DIRS):
+            digest = hashlib.sha256()
+            for chunk in content.chunks():
+                digest.update(chunk)
+            extension = posixpath.splitext(filename)[1].lower()
+            name = posixpath.join(directory, digest.hexdigest()[:HASH_LENGTH] + extension)
+            return self.save_shared(name, content, max_length)
+        return super().save(name, content, max_length)
+
+    def save_shared(self, name, content, max_length=None):
+        """Save ``content`` under ``name``, a name derived from the content,
+        or share the copy already stored there. Returns ``name``."""
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length)
+        if saved != name:
+            # Another request stored the same content under this name
+            # meanwhile; drop the suffixed copy and share theirs.
+            self.delete(saved)
+        return name
@@ -0,0 +1,40 @@
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Test and benchmark runs use a private in-process cache, not the shared
+# one configured in settings, so they neither read nor clear real state.
+ISOLATED_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "state": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "state"},
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_caches = override_settings(CACHES=ISOLATED_CACHES)
+        self._isolated_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_caches.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class IsolatedStorageMixin:
+    """Start each test with empty caches and a temporary MEDIA_ROOT,
+    removed afterwards, so tests neither see nor leave cached entries and
+    uploaded files."""
+
+    def setUp(self):
+        super().setUp()
+        for cache in caches.all():
+            cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
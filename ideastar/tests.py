@@ -0,0 +1,188 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ideastar import db_router, middleware
+from ideastar.db_router import PrimaryReplicaRouter, ReplicaPinningMiddleware
+from ideastar.middleware import CompressionMiddleware, QueryStatsMiddleware
+from users.models import Follow, User
+
+REPLICA = "replica_0"
+FILE_ALIAS = "sqlite_file"
+
+
+class ReplicaRoutingTests(TestCase):
+    """Routes against a second in-memory SQLite database standing in for a
+    replica. Nothing is replicated to it, so the row a read returns tells
+    which alias served it."""
+
+    def setUp(self):
+        # A connection added at runtime rather than in DATABASES, so it
+        # stays out of the test databases and starts empty each test.
+        primary = connections["default"]
+        connections[REPLICA] = type(primary)({**primary.settings_dict, "NAME": ":memory:"}, REPLICA)
+        self.addCleanup(connections.__delitem__, REPLICA)
+        self.addCleanup(connections[REPLICA].close)
+        with connections[REPLICA].schema_editor() as editor:
+            for model in (User, Follow):
+                editor.create_model(model)
+
+        patcher = mock.patch.object(db_router, "replica_aliases", return_value=[REPLICA])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        routers = mock.patch.object(router, "routers", [PrimaryReplicaRouter()])
+        routers.start()
+        self.addCleanup(routers.stop)
+
+        self.author = User.objects.create_user(email="author@example.com", password="pw")
+        self.fan = User.objects.create_user(email="fan@example.com", password="pw")
+        # The replica still holds an older copy of the author.
+        User.objects.using(REPLICA).bulk_create([User(pk=self.author.pk, email="stale@example.com")])
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def get_author_email(self):
+        return self.client.get(f"/api/users/{self.author.pk}/").json()["email"]
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.get_author_email(), "stale@example.com")
+
+    def test_writes_and_migrations_go_to_the_primary(self):
+        response = self.client.post(f"/api/users/{self.author.pk}/follow/")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Follow.objects.using("default").filter(follower=self.fan, followed=self.author).exists())
+        self.assertFalse(Follow.objects.using(REPLICA).exists())
+
+        self.assertEqual(router.db_for_write(User), "default")
+        self.assertTrue(router.allow_migrate("default", "users"))
+        self.assertFalse(router.allow_migrate(REPLICA, "users"))
+
+    def test_read_after_a_write_is_pinned_within_the_request(self):
+        routes = []
+
+        def view(request):
+            routes.append(router.db_for_read(User))
+            router.db_for_write(Follow)
+            routes.append(router.db_for_read(User))
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(routes, [REPLICA, "default"])
+        # Only unsafe requests pin the client's next ones.
+        self.assertNotIn("db_pin", response.cookies)
+
+    def test_signed_cookie_pins_the_next_request(self):
+        response = self.client.post(f"/api/users/{self.author.pk}/follow/")
+        self.assertIn("db_pin", response.cookies)
+        self.assertEqual(self.get_author_email(), "author@example.com")
+
+        self.client.cookies["db_pin"] = "1:tampered"
+        self.assertEqual(self.get_author_email(), "stale@example.com")
+
+
+class SQLiteOptionsTests(SimpleTestCase):
+    """The test database lives in memory, where WAL doesn't apply, so the
+    configured options are checked on a fresh connection to a file."""
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "db.sqlite3")
+        primary = connections["default"]
+        connections[FILE_ALIAS] = type(primary)({**settings.DATABASES["default"], "NAME": self.path}, FILE_ALIAS)
+        self.addCleanup(connections.__delitem__, FILE_ALIAS)
+        self.addCleanup(connections[FILE_ALIAS].close)
+
+    def pragma(self, name):
+        with connections[FILE_ALIAS].cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_new_connection_runs_the_pragmas(self):
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("mmap_size"), int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 ** 2)))
+        self.assertEqual(self.pragma("cache_size"), -int(os.getenv("SQLITE_CACHE_KIB", 64 * 1024)))
+        self.assertEqual(self.pragma("temp_store"), 2)  # MEMORY
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using=FILE_ALIAS):
+            # Nothing written yet, but a second writer is already locked out.
+            with self.assertRaisesRegex(sqlite3.OperationalError, "locked"):
+                other.execute("BEGIN IMMEDIATE")
+
+
+@override_settings(QUERY_STATS_ENABLED=True, QUERY_STATS_N_PLUS_ONE_THRESHOLD=3)
+class QueryStatsMiddlewareTests(TestCase):
+    def respond(self, lookups):
+        def view(request):
+            for pk in range(lookups):
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        with self.assertLogs("ideastar.middleware", "INFO") as logs:
+            response = QueryStatsMiddleware(view)(RequestFactory().get("/api/projects/"))
+        return response, [record for record in logs.records if record.levelname == "WARNING"]
+
+    def test_server_timing_reports_queries_and_durations(self):
+        response, _ = self.respond(2)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=\d+\.\d;desc="2 queries", render;dur=\d+\.\d, total;dur=\d+\.\d$',
+        )
+
+    def test_repeated_statement_is_logged_from_the_threshold(self):
+        _, warnings = self.respond(2)
+        self.assertEqual(warnings, [])
+        _, warnings = self.respond(3)
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("statement ran 3 times", warnings[0].getMessage())
+
+    @override_settings(QUERY_STATS_ENABLED=False)
+    def test_disabled_middleware_drops_out(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryStatsMiddleware(HttpResponse)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def respond(self, body, accept="gzip, deflate, br", content_type="application/json"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: HttpResponse(body, content_type=content_type))(request)
+
+    @skipUnless(middleware.brotli, "brotli is not installed")
+    def test_brotli_is_preferred_over_gzip(self):
+        body = b'{"project_name": "Solar dryer"}' * 100
+        response = self.respond(body)
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(middleware.brotli.decompress(response.content), body)
+        self.assertEqual(self.respond(body, accept="gzip")["Content-Encoding"], "gzip")
+
+    def test_gzip_without_brotli(self):
+        body = b'{"project_name": "Solar dryer"}' * 100
+        with mock.patch.object(middleware, "brotli", None):
+            response = self.respond(body)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_small_and_binary_bodies_are_sent_as_is(self):
+        small = self.respond(b"x" * 1023)
+        self.assertFalse(small.has_header("Content-Encoding"))
+        self.assertEqual(small.content, b"x" * 1023)
+        image = self.respond(b"x" * 4096, content_type="image/png")
+        self.assertFalse(image.has_header("Content-Encoding"))
@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import run_pending
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs on a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOBS_CONCURRENCY)
+        parser.add_argument('--batch-size', type=int, default=settings.JOBS_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the queue.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls.")
+
+    def handle(self, *args, **options):
+        executor = None
+        if options['concurrency'] > 1:
+            executor = ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='jobs')
+        try:
+            while True:
+                ran = run_pending(executor, options['batch_size'])
+                if ran:
+                    self.stdout.write(f"Ran {ran} job(s).")
+                if not options['loop']:
+                    break
+                if ran < options['batch_size']:
+                    time.sleep(options['interval'])
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
@@ -0,0 +1,82 @@
+"""A small database-backed job queue.
+
+Jobs are plain functions registered under a name with ``@register`` in an
+app's ``tasks`` module (imported at startup by ``JobsConfig.ready``).
+``enqueue`` stores a ``Job`` row with JSON keyword arguments; the row is
+written in the caller's transaction, so a job only becomes visible to
+``manage.py run_jobs`` once the work that produced it has committed, and
+disappears with it on rollback.
+
+An ``idempotency_key`` collapses duplicates: while a job with the same key
+is still queued, further ``enqueue`` calls are dropped. With
+``JOBS_EAGER`` set, due jobs run inline instead and exceptions propagate
+to the caller; tests use this to observe side effects without a worker.
+Jobs delayed with ``run_after`` are still stored for a worker.
+"""
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    func: Callable
+    priority: int
+    max_attempts: int
+    atomic: bool
+
+
+_registry = {}
+
+
+def register(name, *, priority=0, max_attempts=None, atomic=True):
+    """Register the decorated function as job ``name``.
+
+    Higher ``priority`` jobs are claimed first. ``atomic`` runs the
+    function and the job's completion in one transaction, so a retry never
+    sees half-applied writes; turn it off for long jobs that write files
+    or talk to other services.
+    """
+    def decorator(func):
+        _registry[name] = Task(
+            name=name,
+            func=func,
+            priority=priority,
+            max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+            atomic=atomic,
+        )
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"No job registered as '{name}'.")
+
+
+def enqueue(name, *, priority=None, idempotency_key=None, run_after=None, **kwargs):
+    """Queue job ``name`` to be called with ``kwargs`` (JSON values only)."""
+    task = get_task(name)
+    if settings.JOBS_EAGER and (run_after is None or run_after <= timezone.now()):
+        task.func(**kwargs)
+        return
+    job = Job(
+        name=name,
+        kwargs=kwargs,
+        priority=task.priority if priority is None else priority,
+        idempotency_key=idempotency_key,
+        max_attempts=task.max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+    if idempotency_key is None:
+        job.save()
+    else:
+        # Conflicts only with a queued job holding the same key.
+        Job.objects.bulk_create([job], ignore_conflicts=True)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import enqueue, register
+from jobs.worker import Heartbeat, claim, release_stale, run_job, run_pending
+
+
+@register('jobs.tests.noop')
+def noop(**kwargs):
+    pass
+
+
+@register('jobs.tests.write')
+def write():
+    Job.objects.create(name='jobs.tests.noop', status=Job.STATUS_DONE)
+
+
+@register('jobs.tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_BASE_SECONDS=30, JOBS_LOCK_TIMEOUT=60)
+class WorkerTests(TestCase):
+    def test_claims_highest_priority_first(self):
+        for priority in (0, 10, 5):
+            enqueue('jobs.tests.noop', priority=priority)
+        enqueue('jobs.tests.noop', priority=20, run_after=timezone.now() + timedelta(minutes=1))
+        self.assertEqual([job.priority for job in claim()], [10, 5, 0])
+
+    def test_idempotency_key_collapses_queued_duplicates(self):
+        enqueue('jobs.tests.noop', idempotency_key='k', n=1)
+        enqueue('jobs.tests.noop', idempotency_key='k', n=2)
+        self.assertEqual(list(Job.objects.values_list('kwargs', flat=True)), [{'n': 1}])
+
+        # Work arriving while the job runs is queued behind it.
+        claim()
+        enqueue('jobs.tests.noop', idempotency_key='k', n=3)
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_QUEUED).get().kwargs, {'n': 3})
+
+    def test_failure_is_retried_with_backoff_then_failed(self):
+        enqueue('jobs.tests.fail')
+        before = timezone.now()
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            run_pending()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 1))
+        self.assertIn("boom", job.last_error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=30))
+        self.assertEqual(run_pending(), 0)
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stale_job_is_released_unless_its_heartbeat_is_fresh(self):
+        enqueue('jobs.tests.noop')
+        job, = claim()
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=2))
+        Heartbeat(job).beat()
+        self.assertEqual(release_stale(), 0)
+
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(release_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_at), (Job.STATUS_QUEUED, None))
+
+    def test_released_run_does_not_record_its_outcome(self):
+        enqueue('jobs.tests.write')
+        lost, = claim()
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=2))
+        release_stale()
+        claim()
+
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            self.assertFalse(run_job(lost))
+        # The atomic job's write was rolled back and the new claim stands.
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_RUNNING, 2))
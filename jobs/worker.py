@@ -0,0 +1,175 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import get_task
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    base = settings.JOBS_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_SECONDS))
+
+
+class ClaimLost(Exception):
+    """The job was released and possibly claimed again while it ran."""
+
+
+def _claimed(job):
+    # ``attempts`` goes up on every claim, so it identifies this run of
+    # the job: once the job is released, nothing this run writes applies.
+    return Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING, attempts=job.attempts)
+
+
+def _requeue(claimed, **fields):
+    """Put the job matched by ``claimed`` back in the queue, or fail it if a
+    newer job with the same idempotency key is already queued (that one
+    covers its work). Returns the number of jobs updated."""
+    try:
+        with transaction.atomic():
+            return claimed.update(status=Job.STATUS_QUEUED, locked_at=None, **fields)
+    except IntegrityError:
+        return claimed.update(
+            status=Job.STATUS_FAILED, locked_at=None, finished_at=timezone.now(), **fields
+        )
+
+
+def release_stale():
+    """Requeue jobs whose worker stopped without reporting back.
+
+    A live worker refreshes ``locked_at`` (see ``Heartbeat``), so only jobs
+    whose heartbeat stopped for ``JOBS_LOCK_TIMEOUT`` are released.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff)
+    return sum(
+        # Re-checked per job, in case a heartbeat landed since the query.
+        _requeue(stale.filter(pk=pk), last_error="Worker lost while running the job.")
+        for pk in stale.values_list('pk', flat=True)
+    )
+
+
+class Heartbeat:
+    """Refresh a running job's ``locked_at`` from a background thread.
+
+    Beats every quarter of ``JOBS_LOCK_TIMEOUT``, so a few missed beats
+    (a busy database, say) do not get the job released.
+    """
+
+    def __init__(self, job):
+        self.claimed = _claimed(job)
+        self.interval = settings.JOBS_LOCK_TIMEOUT / 4
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'jobs-heartbeat-{job.pk}', daemon=True)
+
+    def beat(self):
+        return self.claimed.update(locked_at=timezone.now())
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    if not self.beat():
+                        return
+                except DatabaseError:
+                    logger.warning("Heartbeat failed for %s", self.claimed, exc_info=True)
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def claim(batch_size=None):
+    """Mark up to ``batch_size`` due jobs as running and return them.
+
+    Highest priority first, then oldest. Each job is taken with a
+    conditional UPDATE, so concurrent workers never claim the same one.
+    """
+    batch_size = batch_size or settings.JOBS_BATCH_SIZE
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+        .order_by('-priority', 'run_after', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    claimed = [
+        pk for pk in candidates
+        if Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, locked_at=now, attempts=F('attempts') + 1
+        )
+    ]
+    return list(Job.objects.filter(pk__in=claimed).order_by('-priority', 'run_after', 'pk'))
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome; returns True on success.
+
+    A failing job is retried with exponential backoff until it has been
+    attempted ``max_attempts`` times. The outcome is only recorded while
+    the job is still claimed by this run; if it was released meanwhile,
+    an atomic job's writes are rolled back.
+    """
+    claimed = _claimed(job)
+    try:
+        task = get_task(job.name)
+        with Heartbeat(job):
+            if task.atomic:
+                with transaction.atomic():
+                    task.func(**job.kwargs)
+                    if not claimed.update(status=Job.STATUS_DONE, finished_at=timezone.now(), last_error=''):
+                        raise ClaimLost
+            else:
+                task.func(**job.kwargs)
+                if not claimed.update(status=Job.STATUS_DONE, finished_at=timezone.now(), last_error=''):
+                    raise ClaimLost
+        return True
+    except ClaimLost:
+        logger.warning("Job %s (%s) was released before attempt %s finished", job.pk, job.name, job.attempts)
+        return False
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed on attempt %s", job.pk, job.name, job.attempts)
+        if job.attempts >= job.max_attempts:
+            claimed.update(
+                status=Job.STATUS_FAILED, locked_at=None, finished_at=timezone.now(), last_error=repr(exc)
+            )
+        else:
+            _requeue(claimed, run_after=timezone.now() + retry_delay(job.attempts), last_error=repr(exc))
+        return False
+
+
+def _run_in_thread(job):
+    # Pool threads keep their own connections between jobs; recycle them
+    # the way request handling does.
+    close_old_connections()
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
+
+
+def run_pending(executor=None, batch_size=None):
+    """Claim one batch and run it, on ``executor`` if given.
+
+    Returns the number of jobs claimed.
+    """
+    release_stale()
+    jobs = claim(batch_size)
+    if executor is None:
+        for job in jobs:
+            run_job(job)
+    else:
+        list(executor.map(_run_in_thread, jobs))
+    return len(jobs)
@@ -0,0 +1,4 @@
+from django.contrib import admin
+from mailqueue.models import QueuedEmail
+
+admin.site.register(QueuedEmail)
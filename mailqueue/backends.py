@@ -0,0 +1,31 @@
+from django.core.mail.backends.base import BaseEmailBackend
+
+from jobs.queue import enqueue
+from mailqueue.models import QueuedEmail
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Email backend that stores messages and queues a delivery job.
+
+    Sending is two INSERTs, so request handlers never wait on SMTP.
+    Only the plain-text parts of a message are queued; attachments and
+    HTML alternatives are not carried over.
+    """
+
+    def send_messages(self, email_messages):
+        queued = [
+            QueuedEmail(
+                subject=message.subject,
+                body=message.body,
+                from_email=message.from_email,
+                to=list(message.to),
+                cc=list(message.cc),
+                bcc=list(message.bcc),
+            )
+            for message in email_messages
+            if message.recipients()
+        ]
+        if queued:
+            QueuedEmail.objects.bulk_create(queued)
+            enqueue('mailqueue.deliver', idempotency_key='mailqueue.deliver')
+        return len(queued)
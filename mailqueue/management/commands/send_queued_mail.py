@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mailqueue.worker import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email in batches over a single connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.MAILQUEUE_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the queue.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent = deliver_batch(options['batch_size'])
+            except Exception as exc:
+                if not options['loop']:
+                    raise
+                self.stderr.write(f"Delivery connection failed: {exc!r}")
+                sent = 0
+            if sent:
+                self.stdout.write(f"Sent {sent} queued email(s).")
+            if not options['loop']:
+                break
+            if sent < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,13 @@
+from jobs.queue import register
+from mailqueue.worker import deliver_batch, schedule_delivery
+
+
+@register('mailqueue.deliver', priority=20, atomic=False)
+def deliver_queued_mail():
+    try:
+        deliver_batch()
+    finally:
+        # Also after a connection failure: this job gives up after
+        # JOBS_MAX_ATTEMPTS, but the mail it handed back must not wait
+        # for an unrelated send_mail to queue the next delivery.
+        schedule_delivery()
@@ -0,0 +1,149 @@
+import smtplib
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail import send_mail
+from django.core.mail.backends import locmem
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.worker import run_pending
+from mailqueue.models import QueuedEmail
+from mailqueue.worker import claim_batch, deliver_batch
+
+
+class CountingBackend(locmem.EmailBackend):
+    """Locmem backend that counts connections opened, the way SMTP does."""
+
+    opened = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_open = False
+
+    def open(self):
+        if self.is_open:
+            return False
+        self.is_open = True
+        CountingBackend.opened += 1
+        return True
+
+    def close(self):
+        self.is_open = False
+
+
+class RefusingBackend(CountingBackend):
+    def send_messages(self, messages):
+        raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+
+class UnreachableBackend(CountingBackend):
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+
+@override_settings(
+    EMAIL_BACKEND="mailqueue.backends.QueuedEmailBackend",
+    MAILQUEUE_DELIVERY_BACKEND="mailqueue.tests.CountingBackend",
+    MAILQUEUE_MAX_ATTEMPTS=3,
+    MAILQUEUE_RETRY_BASE_SECONDS=30,
+    JOBS_EAGER=False,
+)
+class DeliveryTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def queue(self, count=1):
+        for i in range(count):
+            send_mail("Subject", f"Body {i}", "noreply@example.com", [f"user{i}@example.com"])
+
+    def test_send_mail_only_queues(self):
+        self.queue(3)
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.STATUS_QUEUED).count(), 3)
+        self.assertEqual(Job.objects.filter(name="mailqueue.deliver").count(), 1)
+        self.assertEqual(mail.outbox, [])
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.queue(5)
+        self.assertEqual(deliver_batch(), 5)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f"user{i}@example.com" for i in range(5)])
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.STATUS_SENT).count(), 5)
+
+    def test_claimed_messages_are_not_sent_again(self):
+        self.queue(2)
+        claimed = claim_batch()
+        self.assertEqual(len(claimed), 2)
+        # A second delivery run while the first holds the rows.
+        self.assertEqual(deliver_batch(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(MAILQUEUE_DELIVERY_BACKEND="mailqueue.tests.RefusingBackend")
+    def test_failure_is_retried_with_backoff(self):
+        self.queue()
+        before = timezone.now()
+        with self.assertLogs("mailqueue.worker", "WARNING"):
+            self.assertEqual(deliver_batch(), 0)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.status, QueuedEmail.STATUS_QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn("SMTPServerDisconnected", queued.last_error)
+        self.assertGreaterEqual(queued.next_attempt_at, before + timedelta(seconds=30))
+        self.assertLess(queued.next_attempt_at, timezone.now() + timedelta(seconds=31))
+
+        # Not due yet.
+        self.assertEqual(claim_batch(), [])
+
+        QueuedEmail.objects.update(next_attempt_at=timezone.now())
+        before = timezone.now()
+        with self.assertLogs("mailqueue.worker", "WARNING"):
+            deliver_batch()
+        queued.refresh_from_db()
+        self.assertEqual(queued.attempts, 2)
+        self.assertGreaterEqual(queued.next_attempt_at, before + timedelta(seconds=60))
+
+    @override_settings(MAILQUEUE_DELIVERY_BACKEND="mailqueue.tests.RefusingBackend")
+    def test_message_fails_after_max_attempts(self):
+        self.queue()
+        for _ in range(3):
+            QueuedEmail.objects.update(next_attempt_at=timezone.now())
+            with self.assertLogs("mailqueue.worker", "WARNING"):
+                deliver_batch()
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.status, QueuedEmail.STATUS_FAILED)
+        self.assertEqual(queued.attempts, 3)
+        self.assertEqual(claim_batch(), [])
+
+    def test_recovers_after_a_retry(self):
+        self.queue()
+        with override_settings(MAILQUEUE_DELIVERY_BACKEND="mailqueue.tests.RefusingBackend"), \
+                self.assertLogs("mailqueue.worker", "WARNING"):
+            deliver_batch()
+        QueuedEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(), 1)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error), (QueuedEmail.STATUS_SENT, 2, ""))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_delivery_resumes_after_a_connection_outage(self):
+        self.queue()
+        with override_settings(MAILQUEUE_DELIVERY_BACKEND="mailqueue.tests.UnreachableBackend"), \
+                self.assertLogs("jobs.worker", "ERROR"):
+            run_pending()
+        queued = QueuedEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (QueuedEmail.STATUS_QUEUED, 0))
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+
+        # Even once the job that hit the outage has given up, the mail it
+        # handed back has a delivery of its own queued.
+        Job.objects.filter(idempotency_key="mailqueue.deliver").update(status=Job.STATUS_FAILED)
+        retry = Job.objects.get(status=Job.STATUS_QUEUED)
+        self.assertEqual((retry.name, retry.run_after), ("mailqueue.deliver", queued.next_attempt_at))
+
+        QueuedEmail.objects.update(next_attempt_at=timezone.now())
+        Job.objects.filter(pk=retry.pk).update(run_after=timezone.now())
+        run_pending()
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.STATUS_SENT)
+        self.assertEqual(len(mail.outbox), 1)
+
@@ -0,0 +1,115 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Min
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from mailqueue.models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    base = settings.MAILQUEUE_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), settings.MAILQUEUE_RETRY_MAX_SECONDS))
+
+
+def schedule_delivery():
+    """Queue a ``mailqueue.deliver`` job for the earliest queued message.
+
+    Due messages and later retries use separate idempotency keys, so a
+    pending retry never holds back mail that can go out now.
+    """
+    next_due = QueuedEmail.objects.filter(
+        status__in=[QueuedEmail.STATUS_QUEUED, QueuedEmail.STATUS_SENDING]
+    ).aggregate(due=Min('next_attempt_at'))['due']
+    if next_due is None:
+        return
+    if next_due <= timezone.now():
+        enqueue('mailqueue.deliver', idempotency_key='mailqueue.deliver')
+    else:
+        enqueue('mailqueue.deliver', idempotency_key='mailqueue.retry', run_after=next_due)
+
+
+def claim_batch(batch_size=None):
+    """Mark up to ``batch_size`` due messages as sending and return them.
+
+    Each row is taken with a conditional UPDATE, so concurrent delivery
+    jobs and ``send_queued_mail`` never send the same message. A claim
+    holds ``next_attempt_at`` for ``MAILQUEUE_LEASE_SECONDS``; rows left
+    in ``sending`` by a worker that died are claimed again after that.
+    """
+    batch_size = batch_size or settings.MAILQUEUE_BATCH_SIZE
+    now = timezone.now()
+    candidates = list(
+        QueuedEmail.objects.filter(
+            status__in=[QueuedEmail.STATUS_QUEUED, QueuedEmail.STATUS_SENDING],
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at').values_list('pk', 'status', 'next_attempt_at')[:batch_size]
+    )
+    lease = now + timedelta(seconds=settings.MAILQUEUE_LEASE_SECONDS)
+    claimed = [
+        pk for pk, status, next_attempt_at in candidates
+        if QueuedEmail.objects.filter(pk=pk, status=status, next_attempt_at=next_attempt_at).update(
+            status=QueuedEmail.STATUS_SENDING, next_attempt_at=lease
+        )
+    ]
+    return list(QueuedEmail.objects.filter(pk__in=claimed).order_by('pk'))
+
+
+def deliver_batch(batch_size=None):
+    """Claim due messages and send them over one delivery connection.
+
+    Returns the number of messages sent. A message that fails is retried
+    with exponential backoff until ``MAILQUEUE_MAX_ATTEMPTS`` is reached.
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0
+
+    sent = 0
+    try:
+        connection = get_connection(settings.MAILQUEUE_DELIVERY_BACKEND)
+        connection.open()
+    except Exception:
+        # Nothing was attempted, so no attempt is counted; hand the batch
+        # back after the first retry delay rather than spinning on an outage.
+        QueuedEmail.objects.filter(pk__in=[queued.pk for queued in batch]).update(
+            status=QueuedEmail.STATUS_QUEUED, next_attempt_at=timezone.now() + retry_delay(1)
+        )
+        raise
+    with connection:
+        for queued in batch:
+            message = EmailMessage(
+                subject=queued.subject,
+                body=queued.body,
+                from_email=queued.from_email,
+                to=queued.to,
+                cc=queued.cc,
+                bcc=queued.bcc,
+                connection=connection,
+            )
+            queued.attempts += 1
+            try:
+                message.send()
+            except Exception as exc:
+                logger.warning("Delivery of queued email %s failed: %r", queued.pk, exc)
+                queued.last_error = repr(exc)
+                if queued.attempts >= settings.MAILQUEUE_MAX_ATTEMPTS:
+                    queued.status = QueuedEmail.STATUS_FAILED
+                else:
+                    queued.status = QueuedEmail.STATUS_QUEUED
+                    queued.next_attempt_at = timezone.now() + retry_delay(queued.attempts)
+            else:
+                queued.status = QueuedEmail.STATUS_SENT
+                queued.sent_at = timezone.now()
+                queued.last_error = ''
+                sent += 1
+
+    QueuedEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return sent
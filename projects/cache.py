@@ -0,0 +1,54 @@
+"""Versioned read-through cache for serialized project responses.
+
+Every cached entry is keyed under the current version, and any write to
+a Project or User replaces the version, so invalidation is exact and
+never depends on a TTL. Entries from older versions are simply never
+read again and age out of the cache backend.
+
+Versions are replaced by whichever process makes the write, including
+``run_jobs`` (renditions) and ``rebuild_project_facets``. The version and
+the per-version entry counters live in the shared ``default`` cache next
+to the responses, so a cached GET, and a 304 revalidation, never touch
+the database. Each write stores a new timestamp rather than incrementing
+a counter: ``set`` is atomic on every backend, and two concurrent writes
+still leave a version no cached entry was stored under. Responses are
+stored at most ``PROJECT_CACHE_MAX_ENTRIES`` per version, so requests with
+ever-new query strings cannot grow the cache without bound; past the
+limit responses are built but not stored. The count is approximate on
+the file cache, whose ``incr`` is not atomic, which is enough for a bound.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = "projects:version"
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from a fresh value so entries written under a lost
+        # version can never be served again.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version(**kwargs):
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def reserve_entry(version):
+    """Return True if another response may be stored under ``version``."""
+    key = f"projects:entries:{version}"
+    cache.add(key, 0, timeout=settings.PROJECT_CACHE_TIMEOUT)
+    try:
+        return cache.incr(key) <= settings.PROJECT_CACHE_MAX_ENTRIES
+    except ValueError:
+        # Evicted between add() and incr().
+        return True
+
+
+def response_key(version, key):
+    return f"projects:response:{version}:{key}"
@@ -0,0 +1,49 @@
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from projects.models import Project, ProjectFacet
+
+
+def adjust_facet(project_field, project_location, delta):
+    if delta > 0:
+        ProjectFacet.objects.bulk_create(
+            [ProjectFacet(project_field=project_field, project_location=project_location)],
+            ignore_conflicts=True,
+        )
+    ProjectFacet.objects.filter(
+        project_field=project_field, project_location=project_location
+    ).update(count=Greatest(F("count") + delta, Value(0)))
+
+
+def facet_counts(project_field=None, project_location=None):
+    """Return per-field and per-country project counts.
+
+    Each dimension is narrowed by the other one's filter, so the counts
+    describe what selecting a facet value would return.
+    """
+    rows = list(
+        ProjectFacet.objects.filter(count__gt=0).values_list("project_field", "project_location", "count")
+    )
+    fields, locations = {}, {}
+    for field, location, count in rows:
+        if not project_location or location == project_location:
+            fields[field] = fields.get(field, 0) + count
+        if not project_field or field == project_field:
+            locations[location] = locations.get(location, 0) + count
+    return {"project_field": fields, "project_location": locations}
+
+
+def rebuild_facets():
+    """Recompute the whole summary table from Project in one aggregate."""
+    totals = (
+        Project.objects.order_by()
+        .values("project_field", "project_location")
+        .annotate(total=Count("id"))
+    )
+    facets = [
+        ProjectFacet(project_field=row["project_field"], project_location=row["project_location"], count=row["total"])
+        for row in totals
+    ]
+    ProjectFacet.objects.all().delete()
+    ProjectFacet.objects.bulk_create(facets)
+    return len(facets)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from ideastar.images import build_renditions, renditions_built
+from projects.models import Project
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Build missing or stale renditions for existing profile and project images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Rebuild every rendition, e.g. after changing IMAGE_RENDITION_SIZES or IMAGE_RENDITION_FORMATS.",
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        for model, field_names in ((User, ["profile_image"]), (Project, ["cover_image", "project_products"])):
+            for instance in model.objects.iterator():
+                for field_name in field_names:
+                    field_file = getattr(instance, field_name)
+                    renditions = getattr(instance, f"{field_name}_renditions") or {}
+                    if not field_file or (renditions.get("source") == field_file.name and not options["force"]):
+                        continue
+                    try:
+                        renditions = build_renditions(field_file)
+                    except Exception as exc:
+                        self.stderr.write(f"{model.__name__} {instance.pk} {field_name}: {exc!r}")
+                        continue
+                    model.objects.filter(pk=instance.pk).update(**{f"{field_name}_renditions": renditions})
+                    renditions_built.send(sender=model, pk=instance.pk)
+                    built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built renditions for {built} image(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from projects.cache import bump_version
+from projects.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the project facet summary table from Project."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_facets()
+        bump_version()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} project facet rows."))
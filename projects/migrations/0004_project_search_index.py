@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE projects_project_fts USING fts5("
+            "project_name, project_description, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            "INSERT INTO projects_project_fts (rowid, project_name, project_description) "
+            "SELECT id, project_name, project_description FROM projects_project"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX project_search_idx ON projects_project USING GIN "
+            "(to_tsvector('simple', project_name || ' ' || project_description))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS projects_project_fts")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS project_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
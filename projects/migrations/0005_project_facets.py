@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:13
+
+import django_countries.fields
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_facets(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    ProjectFacet = apps.get_model('projects', 'ProjectFacet')
+    db_alias = schema_editor.connection.alias
+    totals = Project.objects.using(db_alias).order_by().values('project_field', 'project_location').annotate(total=Count('id'))
+    ProjectFacet.objects.using(db_alias).bulk_create(
+        ProjectFacet(project_field=row['project_field'], project_location=row['project_location'], count=row['total'])
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_project_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_field', models.CharField(choices=[('TECH', 'Technology'), ('AGRI', 'Agriculture'), ('FASH', 'Fashion'), ('HEALTH', 'Health'), ('EDU', 'Education'), ('FIN', 'Finance')], max_length=50)),
+                ('project_location', django_countries.fields.CountryField(max_length=2)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['project_field', 'project_location', 'id'], name='project_field_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['project_location', 'id'], name='project_location_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='projectfacet',
+            unique_together={('project_field', 'project_location')},
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 from django_countries.fields import CountryField
@@ -17,14 +19,54 @@ class Project(models.Model):
     project_name = models.CharField(max_length=255)
     project_description = models.TextField()
     cover_image = models.ImageField(upload_to='cover_images/')
+    cover_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     project_location = CountryField(blank_label="(Select country)")
     project_field = models.CharField(max_length=50, choices=PROJECT_FIELD_CHOICES)
     project_products = models.ImageField(upload_to='project_products/',blank=True, null=True)
+    project_products_renditions = models.JSONField(default=dict, blank=True, editable=False)
     project_document = models.FileField(
         upload_to='project_documents/',
         blank=True,
         null=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_field', 'project_location', 'id'], name='project_field_location_idx'),
+            models.Index(fields=['project_location', 'id'], name='project_location_idx'),
+        ]
+
     def __str__(self):
         return self.project_name
+
+
+class ProjectFacet(models.Model):
+    """Number of projects per (project_field, project_location) pair.
+
+    Maintained incrementally by the signals in ``projects.signals`` so
+    facet counts never need a GROUP BY over the project table.
+    """
+    project_field = models.CharField(max_length=50, choices=Project.PROJECT_FIELD_CHOICES)
+    project_location = CountryField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('project_field', 'project_location')
+
+    def __str__(self):
+        return f"{self.project_field}/{self.project_location}: {self.count}"
+
+
+class ChunkedUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    project = models.ForeignKey(Project, related_name='uploads', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
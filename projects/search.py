@@ -0,0 +1,101 @@
+"""Ranked full-text search over project names and descriptions.
+
+On SQLite the text lives in an FTS5 table (``projects_project_fts``)
+kept in step with ``Project`` by the signals in ``projects.signals``. On
+PostgreSQL a GIN index over the same text's tsvector is used, which the
+database maintains itself. Queries match every word as a prefix, so
+"agri tech" finds "Agritech". Other backends fall back to a
+case-insensitive scan.
+"""
+import re
+
+from django.db import connection, connections, router
+from django.db.models import Q
+
+from projects.models import Project
+
+FTS_TABLE = "projects_project_fts"
+PG_DOCUMENT = "to_tsvector('simple', project_name || ' ' || project_description)"
+
+
+def _terms(query):
+    return re.findall(r"\w+", query)
+
+
+def index_project(project):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [project.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, project_name, project_description) VALUES (%s, %s, %s)",
+            [project.pk, project.project_name, project.project_description],
+        )
+
+
+def unindex_project(pk):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_search_index():
+    """Re-index every project, e.g. after rows were bulk-inserted."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, project_name, project_description) "
+            "SELECT id, project_name, project_description FROM projects_project"
+        )
+
+
+def _search_ids(terms, filters, limit, offset):
+    connection = connections[router.db_for_read(Project)]
+    where, params = [], []
+    for column, value in filters.items():
+        where.append(f"p.{column} = %s")
+        params.append(value)
+
+    if connection.vendor == "sqlite":
+        sql = (
+            f"SELECT p.id FROM {FTS_TABLE} f JOIN projects_project p ON p.id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s {''.join(' AND ' + w for w in where)} "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s OFFSET %s"
+        )
+        params = [" ".join(f'"{term}"*' for term in terms), *params, limit, offset]
+    elif connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        sql = (
+            f"SELECT p.id FROM projects_project p "
+            f"WHERE {PG_DOCUMENT} @@ to_tsquery('simple', %s) {''.join(' AND ' + w for w in where)} "
+            f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s)) DESC, p.id DESC LIMIT %s OFFSET %s"
+        )
+        params = [tsquery, *params, tsquery, limit, offset]
+    else:
+        text = Q()
+        for term in terms:
+            text &= Q(project_name__icontains=term) | Q(project_description__icontains=term)
+        queryset = Project.objects.filter(text, **filters).order_by("-id")
+        return list(queryset.values_list("id", flat=True)[offset:offset + limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_projects(query, queryset=None, project_field=None, project_location=None, limit=20, offset=0):
+    """Return up to ``limit`` projects matching ``query``, best match first."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    filters = {}
+    if project_field:
+        filters["project_field"] = project_field
+    if project_location:
+        filters["project_location"] = project_location
+    ids = _search_ids(terms, filters, limit, offset)
+    projects = (queryset if queryset is not None else Project.objects.all()).in_bulk(ids)
+    return [projects[pk] for pk in ids if pk in projects]
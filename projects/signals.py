@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from ideastar.images import renditions_built, schedule_renditions
+from jobs.queue import enqueue
+from projects.cache import bump_version
+from projects.facets import adjust_facet
+from projects.models import Project
+from projects.search import index_project, unindex_project
+from projects import timeline
+from users.models import Follow
+
+
+@receiver(post_save, sender=Project)
+def build_project_image_renditions(sender, instance, update_fields=None, **kwargs):
+    schedule_renditions(instance, ["cover_image", "project_products"], update_fields)
+
+
+@receiver(post_save, sender=Project)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"project_name", "project_description"} & set(update_fields):
+        index_project(instance)
+
+
+@receiver(post_delete, sender=Project)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_project(instance.pk)
+
+
+FACET_FIELDS = ("project_field", "project_location")
+
+
+@receiver(pre_save, sender=Project)
+def remember_facet(sender, instance, update_fields=None, **kwargs):
+    instance._facet_before = None
+    if instance._state.adding or (update_fields is not None and not set(FACET_FIELDS) & set(update_fields)):
+        return
+    instance._facet_before = Project.objects.filter(pk=instance.pk).values_list(*FACET_FIELDS).first()
+
+
+@receiver(post_save, sender=Project)
+def update_facet_counts(sender, instance, created, **kwargs):
+    current = (instance.project_field, str(instance.project_location))
+    before = getattr(instance, "_facet_before", None)
+    if created:
+        adjust_facet(*current, 1)
+    elif before is not None and before != current:
+        adjust_facet(*before, -1)
+        adjust_facet(*current, 1)
+
+
+@receiver(post_delete, sender=Project)
+def remove_facet_count(sender, instance, **kwargs):
+    adjust_facet(instance.project_field, str(instance.project_location), -1)
+
+
+@receiver(post_save, sender=Project)
+def fan_out_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        enqueue("projects.fan_out", project_id=instance.pk, author_id=instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follower_timeline(sender, instance, **kwargs):
+    timeline.invalidate(instance.follower_id)
+
+
+for model in (Project, settings.AUTH_USER_MODEL):
+    post_save.connect(bump_version, sender=model, dispatch_uid=f"project-cache-save-{model}")
+    post_delete.connect(bump_version, sender=model, dispatch_uid=f"project-cache-delete-{model}")
+renditions_built.connect(bump_version, dispatch_uid="project-cache-renditions")
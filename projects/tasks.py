@@ -0,0 +1,6 @@
+from jobs.queue import register
+from projects.timeline import fan_out, reset_timelines
+
+# Only write to the cache; no transaction needed around them.
+register('projects.fan_out', priority=5, atomic=False)(fan_out)
+register('projects.reset_timelines', priority=5, atomic=False)(reset_timelines)
@@ -1,3 +1,327 @@
-from django.test import TestCase
+import gc
+import hashlib
+import importlib
+import io
+import os
+import tracemalloc
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ideastar.cache import state_cache
+from ideastar.test_runner import IsolatedStorageMixin
+from jobs.models import Job
+from jobs.worker import run_pending
+from projects import search, timeline, uploads
+from projects.facets import facet_counts
+from projects.models import ChunkedUpload, Project, ProjectFacet
+from users.models import User, Follow
+
+@override_settings(JOBS_EAGER=False)
+class TimelineFanOutTests(IsolatedStorageMixin, TestCase):
+    def test_new_project_is_pushed_by_a_job(self):
+        author = User.objects.create_user(email="author@example.com", password="pw")
+        reader = User.objects.create_user(email="reader@example.com", password="pw")
+        Follow.objects.create(follower=reader, followed=author)
+        User.objects.filter(pk=author.pk).update(followers_count=1)
+        self.assertEqual(timeline.timeline_page(reader.pk)[0], [])
+
+        project = Project.objects.create(
+            user=author, project_name="n", project_description="d",
+            project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+        )
+        self.assertTrue(Job.objects.filter(name="projects.fan_out").exists())
+        # Cached timeline is untouched until the job runs.
+        self.assertEqual(list(timeline._pushed_ids(reader.pk)), [])
+
+        run_pending()
+        # A retried job must not push the project twice.
+        timeline.fan_out(project.pk, author.pk)
+        self.assertEqual(list(timeline._pushed_ids(reader.pk)), [project.pk])
+
+    def test_push_waits_for_the_timeline_lock(self):
+        author = User.objects.create_user(email="author@example.com", password="pw")
+        reader = User.objects.create_user(email="reader@example.com", password="pw")
+        Follow.objects.create(follower=reader, followed=author)
+        self.assertEqual(list(timeline._pushed_ids(reader.pk)), [])
+        key = timeline._key(reader.pk)
+        state_cache.add(f"{key}:lock", 1)
+
+        with mock.patch.object(timeline, "LOCK_ATTEMPTS", 2), self.assertRaises(timeline.TimelineBusy):
+            timeline._push([key], 1)
+        self.assertEqual(list(timeline._pushed_ids(reader.pk)), [])
+
+        state_cache.delete(f"{key}:lock")
+        timeline._push([key], 1)
+        timeline._push([key], 2)
+        self.assertEqual(list(timeline._pushed_ids(reader.pk)), [2, 1])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_timelines_reset_when_author_drops_to_the_limit(self):
+        author = User.objects.create_user(email="author@example.com", password="pw")
+        reader = User.objects.create_user(email="reader@example.com", password="pw")
+        other = User.objects.create_user(email="other@example.com", password="pw")
+        Follow.objects.create(follower=reader, followed=author)
+        Follow.objects.create(follower=other, followed=author)
+        run_pending()
+        project = Project.objects.create(
+            user=author, project_name="n", project_description="d",
+            project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+        )
+        run_pending()
+        # Pulled while the author is over the limit, never pushed.
+        self.assertEqual(timeline.timeline_page(reader.pk)[0], [project])
+
+        Follow.objects.filter(follower=other).delete()
+        run_pending()
+        # The counter job queues the reset; the next pass runs it.
+        run_pending()
+        self.assertTrue(Job.objects.filter(name="projects.reset_timelines", status=Job.STATUS_DONE).exists())
+        self.assertEqual(timeline.timeline_page(reader.pk)[0], [project])
+
+
+class ChunkedUploadTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="owner@example.com", password="pw")
+        self.project = Project.objects.create(
+            user=self.user, project_name="n", project_description="d",
+            project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, size, filename="deck.pdf"):
+        response = self.client.post(
+            "/api/uploads/", {"project": self.project.pk, "filename": filename, "size": size}, format="json"
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()["id"]
+
+    def send(self, upload_id, offset, body):
+        return self.client.generic(
+            "PATCH", f"/api/uploads/{upload_id}/", body,
+            content_type="application/offset+octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def stored_documents(self):
+        return [name for _, _, files in os.walk(os.path.join(self.media_root, "project_documents")) for name in files]
+
+    def test_large_upload_memory_stays_bounded(self):
+        chunk = os.urandom(8 * 1024 ** 2)
+        chunks = 128  # 1 GiB
+        upload_id = self.start(len(chunk) * chunks)
+        expected = hashlib.sha256()
+
+        # Test client requests sit in reference cycles that hold their
+        # payload until the collector runs, so collect between requests
+        # and measure each request's own peak above what was live before.
+        peaks = []
+        tracemalloc.start()
+        try:
+            for index in range(chunks):
+                gc.collect()
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                response = self.send(upload_id, index * len(chunk), chunk)
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+                self.assertEqual(response.status_code, 200, response.content)
+                expected.update(chunk)
+        finally:
+            tracemalloc.stop()
+
+        # The test client copies each 8 MiB body once; the view adds a
+        # CHUNKED_UPLOAD_BUFFER_SIZE block, never the whole 1 GiB file.
+        self.assertLess(max(peaks), len(chunk) + 4 * 1024 ** 2)
+        self.assertEqual(response.json()["sha256"], expected.hexdigest())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.project_document.size, len(chunk) * chunks)
+
+    def test_offset_mismatch_is_a_conflict(self):
+        data = os.urandom(3000)
+        upload_id = self.start(len(data))
+        self.assertEqual(self.send(upload_id, 0, data[:1000]).json()["offset"], 1000)
+
+        response = self.send(upload_id, 0, data[:1000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.headers["Upload-Offset"], "1000")
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).offset, 1000)
+
+        response = self.send(upload_id, 1000, data[1000:] + b"past the declared size")
+        self.assertEqual(response.json()["offset"], len(data))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.project_document.read(), data)
+
+    def test_stale_request_does_not_touch_the_written_chunk(self):
+        upload = ChunkedUpload.objects.get(pk=self.start(6))
+        # A second request that loaded the upload before the first finished.
+        stale = ChunkedUpload.objects.get(pk=upload.pk)
+        uploads.append_chunk(upload, 0, io.BytesIO(b"abc"))
+
+        with self.assertRaises(uploads.OffsetMismatch):
+            uploads.append_chunk(stale, 0, io.BytesIO(b"XYZ"))
+        with open(os.path.join(self.media_root, uploads.partial_name(upload)), "rb") as fh:
+            self.assertEqual(fh.read(), b"abc")
+
+    def test_identical_documents_are_stored_once(self):
+        data = os.urandom(5000)
+        for filename in ("deck.pdf", "copy.PDF"):
+            self.send(self.start(len(data), filename), 0, data)
+        self.assertEqual(self.stored_documents(), [f"{hashlib.sha256(data).hexdigest()}.pdf"])
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "upload_chunks")), [])
+
+    def test_identical_document_racing_a_finalize_is_stored_once(self):
+        data = os.urandom(5000)
+        self.send(self.start(len(data)), 0, data)
+        upload_id = self.start(len(data), "copy.pdf")
+        exists = default_storage.exists
+        checks = []
+
+        def racing_exists(name):
+            # The first check runs before the other upload's copy landed.
+            checks.append(name)
+            return len(checks) > 1 and exists(name)
+
+        with mock.patch.object(default_storage, "exists", racing_exists):
+            self.assertEqual(self.send(upload_id, 0, data).status_code, 200)
+        self.assertEqual(self.stored_documents(), [f"{hashlib.sha256(data).hexdigest()}.pdf"])
+
+    def test_retried_final_chunk_finds_the_upload_completed(self):
+        data = os.urandom(3000)
+        upload = ChunkedUpload.objects.get(pk=self.start(len(data)))
+        uploads.append_chunk(upload, 0, io.BytesIO(data[:1000]))
+        # A retry of the last PATCH that loaded the upload before the
+        # first attempt finalized it.
+        retry = ChunkedUpload.objects.get(pk=upload.pk)
+        retry.offset = len(data)
+        uploads.append_chunk(upload, 1000, io.BytesIO(data[1000:]))
+
+        with self.assertRaises(uploads.UploadCompleted):
+            uploads.append_chunk(retry, len(data), io.BytesIO(b""))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.project_document.read(), data)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "upload_chunks")), [])
+        self.assertEqual(self.send(upload.pk, len(data), b"").status_code, 409)
+
+
+
+class SearchTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="owner@example.com", password="pw")
+
+    def create(self, name, description="d"):
+        return Project.objects.create(
+            user=self.user, project_name=name, project_description=description,
+            project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+        )
+
+    def names(self, query, **kwargs):
+        return [project.project_name for project in search.search_projects(query, **kwargs)]
+
+    def test_name_matches_outrank_description_matches(self):
+        self.create("Irrigation pumps", "Solar powered, for smallholders")
+        self.create("Solar dryer", "Dries mangoes")
+        self.create("Water kiosks", "No power needed")
+        self.assertEqual(self.names("solar"), ["Solar dryer", "Irrigation pumps"])
+
+    def test_every_term_matches_as_a_prefix(self):
+        self.create("Agritech marketplace", "Buyers meet farmers")
+        self.create("Agritech drones", "Crop spraying")
+        self.assertEqual(self.names("agri market"), ["Agritech marketplace"])
+        self.assertEqual(sorted(self.names("agri")), ["Agritech drones", "Agritech marketplace"])
+        self.assertEqual(self.names("!!"), [])
+
+    def test_other_backends_fall_back_to_icontains(self):
+        older = self.create("Agritech marketplace", "Buyers meet farmers")
+        newer = self.create("Market days", "Agritech stalls")
+        search.unindex_project(older.pk)
+        search.unindex_project(newer.pk)
+        with mock.patch.object(connection, "vendor", "mysql"):
+            self.assertEqual(self.names("agritech market"), ["Market days", "Agritech marketplace"])
+            self.assertEqual(self.names("buyers"), ["Agritech marketplace"])
+
+    def test_index_follows_create_update_and_delete(self):
+        project = self.create("Beehive sensors")
+        self.assertEqual(self.names("beehive"), ["Beehive sensors"])
+
+        project.project_name = "Hive monitors"
+        project.save(update_fields=["project_name"])
+        self.assertEqual(self.names("beehive"), [])
+        self.assertEqual(self.names("hive"), ["Hive monitors"])
+
+        # Saves that leave the text alone don't touch the index.
+        with mock.patch("projects.signals.index_project") as index:
+            project.save(update_fields=["project_location"])
+        index.assert_not_called()
+
+        project.delete()
+        self.assertEqual(self.names("hive"), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {search.FTS_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class FacetTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="owner@example.com", password="pw")
+
+    def create(self, field, location):
+        return Project.objects.create(
+            user=self.user, project_name="n", project_description="d",
+            project_location=location, project_field=field, cover_image="cover_images/c.jpg",
+        )
+
+    def rows(self):
+        return set(ProjectFacet.objects.filter(count__gt=0).values_list("project_field", "project_location", "count"))
+
+    def test_counts_follow_saves_and_deletes(self):
+        tech = self.create("TECH", "KE")
+        self.create("TECH", "KE")
+        self.create("AGRI", "UG")
+        self.assertEqual(self.rows(), {("TECH", "KE", 2), ("AGRI", "UG", 1)})
+        self.assertEqual(facet_counts(project_location="KE"), {
+            "project_field": {"TECH": 2}, "project_location": {"KE": 2, "UG": 1},
+        })
+
+        tech.project_field = "AGRI"
+        tech.save(update_fields=["project_field"])
+        self.assertEqual(self.rows(), {("TECH", "KE", 1), ("AGRI", "KE", 1), ("AGRI", "UG", 1)})
+
+        tech.project_location = "UG"
+        tech.save()
+        self.assertEqual(self.rows(), {("TECH", "KE", 1), ("AGRI", "UG", 2)})
+
+        # A save that leaves both facets alone doesn't move a count.
+        tech.project_name = "renamed"
+        tech.save()
+        self.assertEqual(self.rows(), {("TECH", "KE", 1), ("AGRI", "UG", 2)})
+
+        tech.delete()
+        self.assertEqual(self.rows(), {("TECH", "KE", 1), ("AGRI", "UG", 1)})
+
+    def test_rebuild_recounts_from_projects(self):
+        self.create("TECH", "KE")
+        self.create("FIN", "TZ")
+        # Queryset updates skip the signals, so only a rebuild catches them.
+        Project.objects.filter(project_field="FIN").update(project_field="EDU")
+        ProjectFacet.objects.create(project_field="HEALTH", project_location="RW", count=3)
+
+        call_command("rebuild_project_facets", stdout=io.StringIO())
+        self.assertEqual(self.rows(), {("TECH", "KE", 1), ("EDU", "TZ", 1)})
+
+    def test_migration_populates_counts_from_existing_projects(self):
+        self.create("TECH", "KE")
+        self.create("TECH", "KE")
+        self.create("AGRI", "UG")
+        ProjectFacet.objects.all().delete()
+
+        migration = importlib.import_module("projects.migrations.0005_project_facets")
+        migration.populate_facets(apps, mock.Mock(connection=connection))
+        self.assertEqual(self.rows(), {("TECH", "KE", 2), ("AGRI", "UG", 1)})
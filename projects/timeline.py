@@ -0,0 +1,179 @@
+"""Home timeline of projects from followed users, with hybrid fan-out.
+
+When an account with at most ``TIMELINE_FANOUT_MAX_FOLLOWERS`` followers
+publishes a project, its id is pushed onto each follower's cached
+timeline. Only timelines that are already cached are updated; the rest
+are rebuilt on first read. Projects from accounts with more followers
+than that are pulled at read time and merged in, so one popular creator
+never triggers a huge write burst. Fan-out runs as a ``projects.fan_out``
+job, so publishing never waits on it.
+
+Pushes from ``run_jobs`` and invalidations from any web worker must reach
+every other process, so timelines need the shared cache configured in
+settings; a per-process cache would serve stale timelines. Every change
+to a cached timeline (push, rebuild, invalidation) holds that timeline's
+lock, an ``add``-ed key in the ``state`` cache, so concurrent fan-out
+jobs for different authors never overwrite each other's pushes.
+
+When an author's follower count falls back to the fan-out limit, their
+recent projects were pulled rather than pushed, so ``reset_timelines``
+drops the followers' cached timelines and they are rebuilt from the
+database.
+
+Timelines are stored as packed signed 64-bit id arrays (``array('q')``),
+newest first, capped at ``TIMELINE_MAX_LENGTH`` entries.
+"""
+import time
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ideastar.cache import state_cache
+from projects.models import Project
+from users.models import User, Follow
+
+# A lock outlives any single read-modify-write by far; waiting for one
+# gives up after LOCK_ATTEMPTS * LOCK_WAIT seconds.
+LOCK_TIMEOUT = 10
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.05
+
+
+class TimelineBusy(Exception):
+    """Some timelines stayed locked; the job is retried later."""
+
+
+def _key(user_id):
+    return f"timeline:{user_id}"
+
+
+def _unpack(raw):
+    ids = array("q")
+    ids.frombytes(raw)
+    return ids
+
+
+def _pack(ids):
+    return array("q", ids[:settings.TIMELINE_MAX_LENGTH]).tobytes()
+
+
+def _followed_projects(user_id, pushed):
+    lookup = "user__followers_count__lte" if pushed else "user__followers_count__gt"
+    return Project.objects.filter(
+        user__followers__follower_id=user_id,
+        **{lookup: settings.TIMELINE_FANOUT_MAX_FOLLOWERS},
+    ).order_by("-id")
+
+
+def _locking(keys, update):
+    """Call ``update`` with the timeline keys whose locks were taken, until
+    every key in ``keys`` has been updated. Returns False if some stayed
+    locked by another process."""
+    pending = list(keys)
+    for _ in range(LOCK_ATTEMPTS):
+        locked = [key for key in pending if state_cache.add(f"{key}:lock", 1, timeout=LOCK_TIMEOUT)]
+        if locked:
+            try:
+                update(locked)
+            finally:
+                state_cache.delete_many([f"{key}:lock" for key in locked])
+            done = set(locked)
+            pending = [key for key in pending if key not in done]
+        if not pending:
+            return True
+        time.sleep(LOCK_WAIT)
+    return False
+
+
+def invalidate(user_id):
+    if not _locking([_key(user_id)], cache.delete_many):
+        # Whoever holds the lock has kept it for over a second; drop the
+        # timeline anyway rather than keep a stale one.
+        cache.delete(_key(user_id))
+
+
+def _follower_keys(author_id):
+    follower_ids = Follow.objects.filter(followed_id=author_id).values_list("follower_id", flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=1000):
+        batch.append(_key(follower_id))
+        if len(batch) == 500:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fan_out(project_id, author_id):
+    """Push a new project onto the cached timelines of the author's followers."""
+    followers_count = User.objects.filter(pk=author_id).values_list("followers_count", flat=True).first()
+    if followers_count is None or followers_count > settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+        return
+    for keys in _follower_keys(author_id):
+        _push(keys, project_id)
+
+
+def reset_timelines(author_id):
+    """Drop the cached timelines of the author's followers."""
+    for keys in _follower_keys(author_id):
+        if not _locking(keys, cache.delete_many):
+            raise TimelineBusy(f"Timelines of followers of {author_id} stayed locked.")
+
+
+def _push(keys, project_id):
+    def push(locked):
+        cached = cache.get_many(locked)
+        # A retried job may push the same project twice.
+        cache.set_many(
+            {key: _pack([project_id, *(pk for pk in _unpack(raw) if pk != project_id)]) for key, raw in cached.items()},
+            timeout=settings.TIMELINE_TIMEOUT,
+        )
+
+    if not _locking(keys, push):
+        raise TimelineBusy(f"Timelines stayed locked while pushing project {project_id}.")
+
+
+def _build(user_id):
+    return array("q", _followed_projects(user_id, pushed=True).values_list("id", flat=True)[:settings.TIMELINE_MAX_LENGTH])
+
+
+def _pushed_ids(user_id):
+    key = _key(user_id)
+    raw = cache.get(key)
+    if raw is not None:
+        return _unpack(raw)
+
+    built = []
+
+    def rebuild(locked):
+        # Built under the lock, so a push that lands meanwhile waits and
+        # then finds the timeline instead of skipping it.
+        raw = cache.get(key)
+        ids = _build(user_id) if raw is None else _unpack(raw)
+        if raw is None:
+            cache.set(key, ids.tobytes(), timeout=settings.TIMELINE_TIMEOUT)
+        built.append(ids)
+
+    if _locking([key], rebuild):
+        return built[0]
+    return _build(user_id)
+
+
+def timeline_page(user_id, queryset=None, before=None, limit=20):
+    """Return ``(projects, next_before)`` for one page of the home timeline.
+
+    ``before`` is the id cursor from the previous page; ``next_before`` is
+    None on the last page.
+    """
+    pushed = [pk for pk in _pushed_ids(user_id) if before is None or pk < before][:limit]
+    pulled = _followed_projects(user_id, pushed=False)
+    if before is not None:
+        pulled = pulled.filter(id__lt=before)
+    ids = sorted(set(pushed).union(pulled.values_list("id", flat=True)[:limit]), reverse=True)[:limit]
+
+    # Re-check follows so deleted projects and unfollowed authors drop out.
+    queryset = queryset if queryset is not None else Project.objects.all()
+    projects = queryset.filter(id__in=ids, user__followers__follower_id=user_id).in_bulk()
+    next_before = ids[-1] if len(ids) == limit else None
+    return [projects[pk] for pk in ids if pk in projects], next_before
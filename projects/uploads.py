@@ -0,0 +1,110 @@
+"""Resumable uploads that stream request bodies straight to storage.
+
+Chunks are appended to a partial file under ``upload_chunks/`` without
+going through Django's upload handlers, so a worker only ever holds one
+``CHUNKED_UPLOAD_BUFFER_SIZE`` block in memory. When the last byte
+arrives the file is hashed and stored once under a content-addressed
+name in ``project_documents/``. An identical document uploaded again
+reuses the stored blob.
+"""
+import fcntl
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from projects.models import ChunkedUpload
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected):
+        super().__init__(f"Expected offset {expected}.")
+        self.expected = expected
+
+
+class UploadCompleted(Exception):
+    def __init__(self):
+        super().__init__("Upload already completed.")
+
+
+def partial_name(upload):
+    return f"upload_chunks/{upload.pk}.part"
+
+
+def append_chunk(upload, offset, stream):
+    """Write ``stream`` to ``upload`` at ``offset`` and return the new offset.
+
+    The body is never allowed to run past the declared upload size.
+    Requests for the same upload take an exclusive lock on the partial
+    file and re-read the upload under it, so a second request can neither
+    truncate nor interleave with a chunk that is still being written. A
+    file lock rather than ``select_for_update``: on SQLite the row lock
+    would hold the database's write lock while the body streams in.
+
+    The request that writes the last byte finalizes the upload before
+    releasing the lock, so a retried final chunk waiting for it finds the
+    upload completed rather than an empty or missing partial file.
+    """
+    if upload.completed_at:
+        raise UploadCompleted()
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    path = default_storage.path(partial_name(upload))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    remaining = upload.size - offset
+    with open(path, "ab") as fh:
+        # Released when the file is closed, after the offset is saved.
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        upload.refresh_from_db(fields=["offset", "completed_at"])
+        if upload.completed_at:
+            if os.fstat(fh.fileno()).st_nlink:
+                # finalize() removed the partial file before this request
+                # opened the path, so open() just created an empty one.
+                os.remove(path)
+            raise UploadCompleted()
+        if offset != upload.offset:
+            raise OffsetMismatch(upload.offset)
+        fh.truncate(offset)
+        while remaining and stream is not None:
+            block = stream.read(min(settings.CHUNKED_UPLOAD_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            fh.write(block)
+            remaining -= len(block)
+        new_offset = fh.tell()
+        ChunkedUpload.objects.filter(pk=upload.pk).update(offset=new_offset)
+        upload.offset = new_offset
+        if new_offset == upload.size:
+            fh.flush()
+            finalize(upload)
+    return new_offset
+
+
+def finalize(upload):
+    """Store the completed upload by content hash and attach it to its project."""
+    part = partial_name(upload)
+    digest = hashlib.sha256()
+    with default_storage.open(part, "rb") as fh:
+        for block in iter(lambda: fh.read(settings.CHUNKED_UPLOAD_BUFFER_SIZE), b""):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+
+    extension = posixpath.splitext(upload.filename)[1].lower()
+    name = f"project_documents/{sha256[:2]}/{sha256}{extension}"
+    with default_storage.open(part, "rb") as fh:
+        name = default_storage.save_shared(name, File(fh))
+    default_storage.delete(part)
+
+    project = upload.project
+    project.project_document.name = name
+    project.save(update_fields=["project_document"])
+
+    upload.sha256 = sha256
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=["sha256", "completed_at"])
+    return project
@@ -0,0 +1,107 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, PositiveIntegerField, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from jobs.queue import enqueue
+from users.models import User, Follow
+
+_signals_suspended = ContextVar("follow_counter_signals_suspended", default=False)
+
+
+@contextmanager
+def suspend_counter_signals():
+    """Stop the Follow signal handlers from adjusting counters, for code
+    that applies the deltas itself in bulk."""
+    token = _signals_suspended.set(True)
+    try:
+        yield
+    finally:
+        _signals_suspended.reset(token)
+
+
+def counter_signals_suspended():
+    return _signals_suspended.get()
+
+
+def _leaving_pull_set(followed_ids, delta):
+    """Lock and return the accounts this decrement takes down to the
+    timeline fan-out limit. Their projects were pulled into timelines at
+    read time until now, and from here on only pushes are read."""
+    if delta >= 0:
+        return []
+    limit = settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+    return list(
+        User.objects.select_for_update()
+        .filter(pk__in=followed_ids, followers_count__gt=limit, followers_count__lte=limit - delta)
+        .values_list("pk", flat=True)
+    )
+
+
+def _reset_timelines(author_ids):
+    for author_id in author_ids:
+        enqueue("projects.reset_timelines", idempotency_key=f"projects.reset_timelines:{author_id}", author_id=author_id)
+
+
+def apply_follow_delta(follower_id, followed_id, delta):
+    """Shift the denormalized follow counters by ``delta`` in the database.
+
+    Each side is a single ``UPDATE ... SET count = count + delta`` so
+    concurrent follows of the same account never lose an increment.
+    """
+    # Only a decrement locks rows, for the timeline limit check.
+    with transaction.atomic() if delta < 0 else nullcontext():
+        crossed = _leaving_pull_set([followed_id], delta)
+        User.objects.filter(pk=follower_id).update(
+            following_count=Greatest(F("following_count") + delta, Value(0))
+        )
+        User.objects.filter(pk=followed_id).update(
+            followers_count=Greatest(F("followers_count") + delta, Value(0))
+        )
+        _reset_timelines(crossed)
+
+
+def apply_bulk_follow_delta(follower_id, followed_ids, delta):
+    """Apply ``delta`` for one follower and many followed users in a single
+    ``UPDATE ... CASE`` statement."""
+    if not followed_ids:
+        return
+    with transaction.atomic() if delta < 0 else nullcontext():
+        crossed = _leaving_pull_set(followed_ids, delta)
+        User.objects.filter(pk__in=[follower_id, *followed_ids]).update(
+            followers_count=Case(
+                When(pk__in=followed_ids, then=Greatest(F("followers_count") + delta, Value(0))),
+                default=F("followers_count"),
+                output_field=PositiveIntegerField(),
+            ),
+            following_count=Case(
+                When(pk=follower_id, then=Greatest(F("following_count") + delta * len(followed_ids), Value(0))),
+                default=F("following_count"),
+                output_field=PositiveIntegerField(),
+            ),
+        )
+        _reset_timelines(crossed)
+
+
+def _count_subquery(field):
+    return Coalesce(
+        Subquery(
+            Follow.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+def recount_follow_counts():
+    """Recompute every user's counters from ``Follow`` in one UPDATE."""
+    return User.objects.update(
+        followers_count=_count_subquery("followed"),
+        following_count=_count_subquery("follower"),
+    )
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from users.counters import suspend_counter_signals
+from users.models import User, Follow
+
+
+def _batches(ids):
+    size = settings.BULK_FOLLOW_BATCH_SIZE
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _insert_follows(connection, follower_id, followed_ids):
+    """INSERT one row per followed id, skipping pairs that already exist,
+    and return the ids that were actually inserted."""
+    created_at = Follow._meta.get_field("created_at").get_db_prep_value(timezone.now(), connection)
+    rows = ", ".join(["(%s, %s, %s)"] * len(followed_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {Follow._meta.db_table} (follower_id, followed_id, created_at) VALUES {rows} "
+            "ON CONFLICT (follower_id, followed_id) DO NOTHING RETURNING followed_id",
+            [value for pk in followed_ids for value in (follower_id, pk, created_at)],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def bulk_follow(follower_id, user_ids):
+    """Follow every existing user in ``user_ids`` not already followed.
+
+    One query finds the new targets, then each batch is one INSERT plus
+    one queued counter job. A pair followed concurrently between the two
+    is skipped by the INSERT, and the counter job only covers the rows it
+    returned. Returns the ids that were newly followed.
+    """
+    targets = list(
+        User.objects.filter(pk__in=set(user_ids))
+        .exclude(pk=follower_id)
+        .exclude(followers__follower_id=follower_id)
+        .values_list("pk", flat=True)
+    )
+    connection = connections[router.db_for_write(Follow)]
+    followed = []
+    with transaction.atomic(using=connection.alias):
+        for batch in _batches(targets):
+            inserted = _insert_follows(connection, follower_id, batch)
+            if inserted:
+                enqueue("users.apply_bulk_follow_delta", follower_id=follower_id, followed_ids=inserted, delta=1)
+            followed += inserted
+    return followed
+
+
+def bulk_unfollow(follower_id, user_ids):
+    """Unfollow every user in ``user_ids``; returns the ids that were removed.
+
+    Each batch locks the follows it is about to delete, so a concurrent
+    unfollow of the same pair either finishes first and is not counted
+    here, or waits for this transaction.
+    """
+    unfollowed = []
+    with transaction.atomic(using=router.db_for_write(Follow)), suspend_counter_signals():
+        for batch in _batches(sorted(set(user_ids))):
+            follows = Follow.objects.select_for_update().filter(follower_id=follower_id, followed_id__in=batch)
+            removed = list(follows.values_list("followed_id", flat=True))
+            if not removed:
+                continue
+            Follow.objects.filter(follower_id=follower_id, followed_id__in=removed).delete()
+            enqueue("users.apply_bulk_follow_delta", follower_id=follower_id, followed_ids=removed, delta=-1)
+            unfollowed += removed
+    return unfollowed
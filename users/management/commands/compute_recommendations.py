@@ -0,0 +1,21 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.recommendations import compute_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recompute 'who to follow' recommendations for every user from the Follow graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=settings.FOLLOW_RECOMMENDATIONS_TOP_K, help="Recommendations stored per user.")
+        parser.add_argument("--max-fanout", type=int, default=200, help="Neighbours expanded per hop.")
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        written = compute_recommendations(top_k=options["top_k"], max_fanout=options["max_fanout"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} recommendations in {perf_counter() - start:.1f}s."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.counters import recount_follow_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute followers_count/following_count for every user from Follow."
+
+    def handle(self, *args, **options):
+        updated = recount_follow_counts()
+        self.stdout.write(self.style.SUCCESS(f"Recounted follow counters for {updated} users."))
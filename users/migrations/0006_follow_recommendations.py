@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('reason', models.CharField(choices=[('mutual', 'Followed by people you follow'), ('field', 'Works in your project field')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-score'], name='recommendation_user_score_idx')],
+                'unique_together': {('user', 'recommended')},
+            },
+        ),
+    ]
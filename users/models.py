@@ -1,8 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -27,6 +25,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     first_name = models.CharField(_('first name'), max_length=150, blank=True)
     last_name = models.CharField(_('last name'), max_length=150, blank=True) 
     profile_image = models.ImageField(upload_to='profile_images/', null=True, blank=True)
+    profile_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     followers_count = models.PositiveIntegerField(default=0)
     following_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -50,19 +49,26 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('follower', 'followed')
+        indexes = [
+            models.Index(fields=['followed', 'created_at'], name='follow_followed_created_idx'),
+            models.Index(fields=['follower', 'created_at'], name='follow_follower_created_idx'),
+        ]
 
-@receiver(post_save, sender=Follow)
-def update_follow_counts_on_save(sender, instance, created, **kwargs):
-    if created:
-        instance.follower.following_count += 1
-        instance.follower.save(update_fields=['following_count'])
-        instance.followed.followers_count += 1
-        instance.followed.save(update_fields=['followers_count'])
 
-def update_follow_counts_on_delete(sender, instance, **kwargs):
-    instance.follower.following_count = max(0, instance.follower.following_count - 1)
-    instance.follower.save(update_fields=['following_count'])
-    instance.followed.followers_count = max(0, instance.followed.followers_count - 1)
-    instance.followed.save(update_fields=['followers_count'])
+class FollowRecommendation(models.Model):
+    REASON_CHOICES = [
+        ('mutual', 'Followed by people you follow'),
+        ('field', 'Works in your project field'),
+    ]
 
-models.signals.pre_delete.connect(update_follow_counts_on_delete, sender=Follow)
\ No newline at end of file
+    user = models.ForeignKey(User, related_name='recommendations', on_delete=models.CASCADE)
+    recommended = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'recommended')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='recommendation_user_score_idx'),
+        ]
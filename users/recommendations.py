@@ -0,0 +1,142 @@
+"""Offline "who to follow" recommendations from the Follow graph.
+
+The follow graph is loaded once into a compressed sparse row (CSR)
+adjacency built from ``array`` buffers: ``indptr[i]:indptr[i + 1]``
+slices ``indices`` to give the accounts user ``i`` follows. For each
+user, candidates are scored by:
+
+* friends of friends: accounts followed by the accounts they follow,
+  one point per mutual connection;
+* shared project field: the most-followed creators in the fields the
+  user publishes in, worth ``FIELD_SCORE`` each.
+
+Accounts the user already follows are excluded, and the top-K results
+are written to ``FollowRecommendation``. To bound the work for very
+connected users, at most ``max_fanout`` neighbours are expanded per hop.
+Results are held in ``array`` columns until they are written with
+``executemany``, so memory grows by a few dozen bytes per stored row
+rather than by a model instance.
+"""
+import heapq
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from users.models import User, Follow, FollowRecommendation
+
+FIELD_SCORE = 0.5
+FIELD_CANDIDATES = 50
+REASONS = ("field", "mutual")
+
+
+def build_adjacency(user_ids, edges):
+    """Return ``(index, indptr, indices)`` for ``edges`` sorted by follower.
+
+    ``index`` maps user id to row number; ``indices`` holds row numbers.
+    Edges of accounts missing from ``user_ids`` (created after it was
+    read) are skipped.
+    """
+    index = {pk: row for row, pk in enumerate(user_ids)}
+    indptr = array("q", [0]) * (len(user_ids) + 1)
+    indices = array("q")
+    for follower, followed in edges:
+        if follower not in index or followed not in index:
+            continue
+        indices.append(index[followed])
+        indptr[index[follower] + 1] += 1
+    for row in range(len(user_ids)):
+        indptr[row + 1] += indptr[row]
+    return index, indptr, indices
+
+
+def friends_of_friends(row, indptr, indices, max_fanout):
+    followed = indices[indptr[row]:indptr[row + 1]]
+    scores = Counter()
+    for middle in followed[:max_fanout]:
+        start = indptr[middle]
+        scores.update(indices[start:min(indptr[middle + 1], start + max_fanout)])
+    scores.pop(row, None)
+    for already in followed:
+        scores.pop(already, None)
+    return scores
+
+
+def _field_candidates(index):
+    """Map each project field to rows of its most-followed creators, and
+    each row to the fields it publishes in."""
+    from projects.models import Project
+
+    creators = defaultdict(list)
+    fields_by_row = defaultdict(set)
+    rows = (
+        Project.objects.order_by("project_field", "-user__followers_count")
+        .values_list("project_field", "user_id")
+        .distinct()
+    )
+    for field, user_id in rows.iterator(chunk_size=10000):
+        row = index.get(user_id)
+        if row is None:
+            continue
+        fields_by_row[row].add(field)
+        if len(creators[field]) < FIELD_CANDIDATES and row not in creators[field]:
+            creators[field].append(row)
+    return creators, fields_by_row
+
+
+def _write(rows, batch_size):
+    users, recommended, scores, reasons = rows
+    connection = connections[router.db_for_write(FollowRecommendation)]
+    created_at = FollowRecommendation._meta.get_field("created_at").get_db_prep_value(timezone.now(), connection)
+    sql = (
+        f"INSERT INTO {FollowRecommendation._meta.db_table} "
+        "(user_id, recommended_id, score, reason, created_at) VALUES (%s, %s, %s, %s, %s)"
+    )
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        FollowRecommendation.objects.using(connection.alias).all().delete()
+        for start in range(0, len(users), batch_size):
+            end = start + batch_size
+            cursor.executemany(sql, [
+                (user_id, recommended_id, score, REASONS[reason], created_at)
+                for user_id, recommended_id, score, reason in zip(
+                    users[start:end], recommended[start:end], scores[start:end], reasons[start:end]
+                )
+            ])
+
+
+def compute_recommendations(top_k=None, max_fanout=200, batch_size=5000):
+    """Recompute and store recommendations for every user; returns the
+    number of rows written.
+
+    ``top_k`` defaults to ``FOLLOW_RECOMMENDATIONS_TOP_K``. Accounts that
+    sign up while the graph is being read are left for the next run.
+    """
+    top_k = top_k or settings.FOLLOW_RECOMMENDATIONS_TOP_K
+    user_ids = array("q", User.objects.order_by("pk").values_list("pk", flat=True))
+    edges = Follow.objects.order_by("follower_id").values_list("follower_id", "followed_id")
+    index, indptr, indices = build_adjacency(user_ids, edges.iterator(chunk_size=10000))
+    creators, fields_by_row = _field_candidates(index)
+
+    rows = (array("q"), array("q"), array("d"), array("b"))
+    users, recommended, scores_out, reasons = rows
+    for row, user_id in enumerate(user_ids):
+        scores = friends_of_friends(row, indptr, indices, max_fanout)
+        field_only = set()
+        following = set(indices[indptr[row]:indptr[row + 1]])
+        for field in fields_by_row.get(row, ()):
+            for candidate in creators[field]:
+                if candidate != row and candidate not in following:
+                    if candidate not in scores:
+                        field_only.add(candidate)
+                    scores[candidate] += FIELD_SCORE
+        for candidate, score in heapq.nlargest(top_k, scores.items(), key=itemgetter(1)):
+            users.append(user_id)
+            recommended.append(user_ids[candidate])
+            scores_out.append(score)
+            reasons.append(candidate not in field_only)
+
+    _write(rows, batch_size)
+    return len(users)
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from ideastar.images import schedule_renditions
+from jobs.queue import enqueue
+from users.models import User, Follow
+from users.counters import counter_signals_suspended
+
+
+@receiver(post_save, sender=Follow)
+def update_follow_counts_on_save(sender, instance, created, **kwargs):
+    if created and not counter_signals_suspended():
+        enqueue("users.apply_follow_delta", follower_id=instance.follower_id, followed_id=instance.followed_id, delta=1)
+
+
+@receiver(post_delete, sender=Follow)
+def update_follow_counts_on_delete(sender, instance, **kwargs):
+    if not counter_signals_suspended():
+        enqueue("users.apply_follow_delta", follower_id=instance.follower_id, followed_id=instance.followed_id, delta=-1)
+
+
+@receiver(post_save, sender=User)
+def build_profile_image_renditions(sender, instance, update_fields=None, **kwargs):
+    schedule_renditions(instance, ["profile_image"], update_fields)
@@ -0,0 +1,5 @@
+from jobs.queue import register
+from users.counters import apply_bulk_follow_delta, apply_follow_delta
+
+register('users.apply_follow_delta', priority=10)(apply_follow_delta)
+register('users.apply_bulk_follow_delta', priority=10)(apply_bulk_follow_delta)
@@ -1,3 +1,100 @@
-from django.test import TestCase
+from array import array
+from contextvars import Context
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from projects.models import Project
+from users import follows
+from users.counters import recount_follow_counts
+from users.models import User, Follow, FollowRecommendation
+from users.recommendations import build_adjacency, compute_recommendations
+
+
+def _racing(action):
+    """Run ``action`` after the targets are read but before the first write,
+    like a single follow or unfollow landing from another request."""
+    batches = follows._batches
+
+    def racing_batches(ids):
+        # A fresh context, so the other request's signals are not suspended.
+        Context().run(action)
+        yield from batches(ids)
+
+    return mock.patch("users.follows._batches", racing_batches)
+
+
+@override_settings(JOBS_EAGER=True, BULK_FOLLOW_BATCH_SIZE=2)
+class BulkFollowTests(TestCase):
+    def setUp(self):
+        self.fan = User.objects.create_user(email="fan@example.com", password="pw")
+        self.others = [User.objects.create_user(email=f"user{i}@example.com", password="pw") for i in range(5)]
+        self.ids = [user.pk for user in self.others]
+
+    def assertCountersMatchFollows(self):
+        counters = dict(User.objects.values_list("pk", "followers_count"))
+        following = User.objects.get(pk=self.fan.pk).following_count
+        recount_follow_counts()
+        self.assertEqual(counters, dict(User.objects.values_list("pk", "followers_count")))
+        self.assertEqual(following, User.objects.get(pk=self.fan.pk).following_count)
+
+    def test_bulk_follow_and_unfollow(self):
+        self.assertEqual(sorted(follows.bulk_follow(self.fan.pk, self.ids + [self.fan.pk, 0])), self.ids)
+        self.assertEqual(follows.bulk_follow(self.fan.pk, self.ids), [])
+        self.assertCountersMatchFollows()
+        self.assertEqual(User.objects.get(pk=self.fan.pk).following_count, 5)
+
+        self.assertEqual(follows.bulk_unfollow(self.fan.pk, self.ids[:3] + [0]), self.ids[:3])
+        self.assertCountersMatchFollows()
+        self.assertEqual(User.objects.get(pk=self.fan.pk).following_count, 2)
+
+    def test_concurrent_follow_is_not_counted_twice(self):
+        racer = self.others[2]
+        with _racing(lambda: Follow.objects.create(follower=self.fan, followed=racer)):
+            followed = follows.bulk_follow(self.fan.pk, self.ids)
+        self.assertNotIn(racer.pk, followed)
+        self.assertEqual(Follow.objects.filter(follower=self.fan).count(), 5)
+        self.assertCountersMatchFollows()
+
+    def test_concurrent_unfollow_is_not_counted_twice(self):
+        follows.bulk_follow(self.fan.pk, self.ids)
+        racer = self.others[2]
+        with _racing(lambda: Follow.objects.get(follower=self.fan, followed=racer).delete()):
+            unfollowed = follows.bulk_unfollow(self.fan.pk, self.ids)
+        self.assertEqual(sorted(unfollowed), [pk for pk in self.ids if pk != racer.pk])
+        self.assertCountersMatchFollows()
+        self.assertEqual(User.objects.get(pk=self.fan.pk).following_count, 0)
+
+
+class RecommendationTests(TestCase):
+    def test_friends_of_friends_and_shared_field(self):
+        a, b, c, d, e = [User.objects.create_user(email=f"{name}@example.com", password="pw") for name in "abcde"]
+        Follow.objects.bulk_create([
+            Follow(follower=a, followed=b),
+            Follow(follower=b, followed=c),
+            Follow(follower=b, followed=d),
+            Follow(follower=e, followed=d),
+        ])
+        Project.objects.bulk_create([
+            Project(
+                user=user, project_name="n", project_description="d",
+                project_location="KE", project_field="TECH", cover_image="cover_images/c.jpg",
+            )
+            for user in (a, e)
+        ])
+
+        compute_recommendations()
+        self.assertEqual(
+            sorted(FollowRecommendation.objects.filter(user=a).values_list("recommended_id", "score", "reason")),
+            [(c.pk, 1.0, "mutual"), (d.pk, 1.0, "mutual"), (e.pk, 0.5, "field")],
+        )
+        # e already follows d, who follows nobody; only the shared field is left.
+        self.assertEqual(
+            list(FollowRecommendation.objects.filter(user=e).values_list("recommended_id", "reason")),
+            [(a.pk, "field")],
+        )
+
+    def test_accounts_created_during_the_run_are_skipped(self):
+        # 9 signed up after the user ids were read.
+        index, indptr, indices = build_adjacency(array("q", [1, 2]), [(1, 2), (1, 9), (9, 1)])
+        self.assertEqual((list(indptr), list(indices)), ([0, 1, 1], [index[2]]))